@@ -29,7 +29,7 @@ def create_app(config_name=None):
   
   CORS(app, resources={
     r"/*": {
-      "origins": ["http://localhost:3000", "https://stock-advisor-frontend.onrender.com"],
+      "origins": app.config['CORS_ORIGINS'],
       "methods": ["GET", "POST", "OPTIONS", "DELETE", "PUT"],
       "allow_headers": ["Content-Type"]
     }
@@ -38,10 +38,17 @@ def create_app(config_name=None):
   db.init_app(app)
   migrate.init_app(app, db)
 
+  from . import metrics
+  metrics.init_app(app)
+
   from .routes import bp as routes_bp
   app.register_blueprint(routes_bp)
 
-  with app.app_context():
-    db.create_all()
+  from .jobs import scheduler
+  scheduler.init_app(app)
+
+  from .cli import register_commands
+  register_commands(app)
 
+  # The schema is created with 'flask init-db' and changed through migrations, not on every start
   return app
\ No newline at end of file
@@ -1,138 +1,172 @@
 import re
-#from transformers import AutoTokenizer, AutoModelForSequenceClassification
-#import torch
-#import torch.nn.functional as F
 import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-import openai
+
+from app.classifiers import PROMPT_VERSION, ClassificationError, router
+from app.company_matcher import CompanyMatcher
+from app.metrics import current_work, timed
+from app.storage.classification_cache import cache_key, classification_cache
+from app.storage.company_registry import company_registry
 
 load_dotenv()
 
-# Set environment variable to avoid tokenizer warnings
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
+# Define the labels used by the classifiers: negative, neutral, and positive sentiment
+labels = ["Positive", "Negative", "Neutral"]
 
-# Load the tokenizer specific to the ProsusAI FinBERT model
-# This tokenizer splits and encodes financial text in a way that matches the model's expectations
-#tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-# Load the actual pretrained FinBERT model for sequence classification
-# The model has been fine-tuned to classify financial text sentiment
-#model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+# Tickers written as (AAPL), $AAPL or NASDAQ: AAPL
+TICKER_PATTERN = re.compile(r'(?:\(?\b(?:NASDAQ|NYSE|NYSEARCA|AMEX)\s*:\s*|\(|\$)([A-Z]{1,5}(?:\.[A-Z])?)\b')
 
-# Define the labels used by the model: negative, neutral, and positive sentiment
-labels = ["Positive", "Negative", "Neutral"]
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def company_matcher():
+  """Matcher over the names of every known company, rebuilt when companies were added"""
+  global _matcher
+  names = company_registry.names()
+  with _matcher_lock:
+    # Companies are only ever added, so the size tells whether the matcher is stale
+    if _matcher is None or _matcher.size != len(names):
+      _matcher = CompanyMatcher(names)
+    return _matcher
+
+
+def extract_stocks(text, matcher=None):
+  """Symbols of the companies a text mentions, by ticker or by company name"""
+  matcher = matcher or company_matcher()
+  return set(TICKER_PATTERN.findall(text)) | matcher.find(text)
+
+
+@lru_cache(maxsize=1024)
+def _bare_ticker_pattern(symbol):
+  # 'AAPL stock climbs'; single letter tickers would match ordinary words
+  if len(symbol) < 2:
+    return None
+  return re.compile(rf'(?<![\w.]){re.escape(symbol)}(?!\w|\.\w)')
+
+
+def relevance_score(article, symbol, matcher=None):
+  # 1 if the headline mentions the company, 0.5 if only the summary does, else 0
+  symbol = symbol.upper()
+  matcher = matcher or company_matcher()
+  bare_ticker = _bare_ticker_pattern(symbol)
+  for text, score in ((article.get('headline') or '', 1.0), (article.get('summary') or '', 0.5)):
+    if symbol in extract_stocks(text, matcher) or (bare_ticker and bare_ticker.search(text)):
+      return score
+  return 0.0
+
+
+def filter_relevant(symbol, articles, min_score):
+  """Articles about the company of `symbol`, dropping loosely related ones before they are classified
+
+  Every article is kept when min_score is 0 or the company is unknown, as
+  there is no name to match against then.
+  """
+  if min_score <= 0 or symbol.upper() not in company_registry.ensure([symbol]):
+    return list(articles)
+  with timed('relevance'):
+    matcher = company_matcher()
+    return [article for article in articles if relevance_score(article, symbol, matcher) >= min_score]
+
+
+DEFAULT_BATCH_SIZE = 20
+
+
+def active_model():
+  # Model of the preferred backend, part of the cache key so backends never share results
+  return router.primary.model
+
+
+def load_classifier():
+  """Load the local model up front when it is the preferred backend, so the first request doesn't pay for it"""
+  if router.primary.name == "finbert":
+    from app.finbert import finbert
+    finbert.load()
+
+
+def classify_text(title):
+  """Cached single text classification, raises ClassificationError if every backend failed"""
+  return classify_texts([title], batch_size=1)[0]
+
+
+def classify_texts(texts, batch_size=DEFAULT_BATCH_SIZE):
+  """Classify a list of texts, packing up to `batch_size` of them into each request.
+
+  Cached results are reused, and entries that can't be parsed from a batch
+  response are retried one by one.
+  """
+  return [result for _, result in sorted(classify_concurrently(texts, max_workers=1, batch_size=batch_size))]
+
+
+def classify_concurrently(texts, classifier=None, max_workers=8,
+                          batch_size=DEFAULT_BATCH_SIZE, use_cache=True):
+  """Classify many texts in parallel batches, yielding (index, result) as each batch finishes.
+
+  Cached results are yielded first. Results arrive in completion order; callers
+  that need a stable order should place them by index. `classifier` takes a
+  list of texts and can be swapped for a stub when benchmarking; by default
+  the classifier router picks the backend for each batch. When the local
+  model is preferred it runs one padded batch at a time on its own threads,
+  so it gets a single worker and its own batch size. Cache reads and writes
+  happen on the calling thread so the database tier stays usable.
+
+  Raises ClassificationError if a text couldn't be classified by any backend,
+  rather than counting it as neutral.
+  """
+  if not texts:
+    return
+
+  primary = router.primary
+  if classifier is None:
+    classifier = router.classify
+    if primary.name == "finbert":
+      from app.finbert import finbert
+      max_workers, batch_size = 1, finbert.batch_size
+
+  pending = list(range(len(texts)))
+  keys = [cache_key(text, primary.model, PROMPT_VERSION) for text in texts]
+  if use_cache:
+    cached = classification_cache.get_many(keys)
+    pending = [i for i in pending if keys[i] not in cached]
+    for i in range(len(texts)):
+      if keys[i] in cached:
+        # Only results of the preferred backend are stored under its key
+        yield i, {**cached[keys[i]], "backend": primary.name}
+
+  if not pending:
+    return
+
+  batch_size = max(1, batch_size)
+  batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+
+  # Worker threads have no app context, so they are handed the caller's unit of work for timing
+  work = current_work()
+  def classify_batch(batch_texts):
+    with timed('classify', 'batch', work=work):
+      return classifier(batch_texts)
+
+  with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+    futures = {executor.submit(classify_batch, [texts[i] for i in batch]): batch for batch in batches}
+    for future in as_completed(futures):
+      new_results = {}
+      for i, result in zip(futures[future], future.result()):
+        if result is None:
+          raise ClassificationError(f"No classifier backend could classify: {texts[i][:80]!r}")
+        if result.get("backend", primary.name) == primary.name:
+          # Fallback results aren't cached, so the text is classified properly next time
+          new_results[keys[i]] = {"sentiment": result["sentiment"], "probabilities": result["probabilities"]}
+        yield i, result
+
+      if use_cache:
+        classification_cache.set_many(new_results, primary.model, PROMPT_VERSION)
 
-#def classify_text_finbert(text):
-#  # Tokenize the input text for the model
-#  # 'return_tensors="pt"' tells the tokenizer to return PyTorch tensors
-#  # 'truncation' and 'padding' ensure consistent input size
-#  inputs = tokenizer(
-#    text,
-#    return_tensors="pt"
-#  )
-#  
-#  # Turn off gradient tracking since we are doing inference, not training
-#  with torch.no_grad():
-#    # Pass the tokenized input through the model to get raw outputs (logits)
-#    outputs = model(**inputs)
-#  
-#  # Apply softmax to convert logits into probabilities for each class
-#  probs = F.softmax(outputs.logits, dim=1)
-#  
-#  # Get index of highest probability
-#  pred_idx = torch.argmax(probs, dim=1).item()
-#
-#  return {
-#      "sentiment": labels[pred_idx],
-#      "probabilities": dict(zip(labels, probs[0].tolist()))
-#  }
-
-def extract_stocks(text):
-  # Simple regex-based company extraction
-  companies = []
-  
-  # Look for stock symbols in parentheses
-  stock_pattern = r'\(([A-Z]{1,5})\)'
-  matches = re.findall(stock_pattern, text)
-  companies.extend(matches)
-  
-  # Look for common company suffixes
-  company_pattern = r'([A-Z][A-Za-z\s&]+?(?:Inc\.|Corp\.|Ltd\.|LLC|Co\.|Company|Corporation|Limited))'
-  matches = re.findall(company_pattern, text)
-  companies.extend(matches)
-  
-  # Look for standalone capitalized words that might be company names
-  standalone_pattern = r'\b([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)\b'
-  matches = re.findall(standalone_pattern, text)
-  companies.extend(matches)
-  
-  return list(set(companies))
-
-def classify_text(title): 
-  # Function to analyze a news article using ChatGPT
-  client = openai.OpenAI(api_key=os.environ.get("GPT_API_KEY"))
-  
-  prompt = f"""Analyze the sentiment of this financial news text and respond with ONLY the sentiment classification and probability score in this exact format:
-              sentiment probability
-                Where sentiment must be exactly one of: positive, negative, neutral
-                And probability must be a number between 0 and 1 (e.g., 0.85)
-                
-                Text to analyze: {title}
-
-                Respond with only the sentiment and probability, nothing else."""
-
-  try:
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-          {"role": "user", "content": prompt}
-        ],
-        temperature=0.1  # Low temperature for more consistent outputs
-      )
-    
-    response = completion.choices[0].message.content.strip()
-    
-    # Parse the response to extract sentiment and probability
-    parts = response.split()
-    if len(parts) >= 2:
-        sentiment = parts[0].lower()
-        try:
-            probability = float(parts[1])
-            # Ensure probability is between 0 and 1
-            probability = max(0.0, min(1.0, probability))
-        except ValueError:
-            probability = 0.5  # Default probability if parsing fails
-    else:
-        sentiment = "neutral"
-        probability = 0.5
-    
-    # Ensure sentiment is one of the expected values
-    if sentiment not in ["positive", "negative", "neutral"]:
-        sentiment = "neutral"
-    
-    #companies = extract_stocks(title)
-    
-    return {
-        "sentiment": sentiment.capitalize(),
-        "probabilities": {
-            "Positive": probability if sentiment == "positive" else 0.0,
-            "Negative": probability if sentiment == "negative" else 0.0,
-            "Neutral": probability if sentiment == "neutral" else 0.0
-        },
-        #"companies": companies
-    }
-    
-  except Exception as e:
-    print(f"Error in ChatGPT classification: {e}")
-    # Fallback to neutral sentiment
-    companies = extract_stocks(title)
-    return {
-        "sentiment": "Neutral",
-        "probabilities": {"Positive": 0.0, "Negative": 0.0, "Neutral": 1.0},
-        #"companies": companies
-    }
-  
 
 def gpt_test():
+  import openai
+
   client = openai.OpenAI(api_key=os.environ.get("GPT_API_KEY"))
   #prompt = f"Extract the full text of the article at this URL: https://finnhub.io/api/news?id=63bc3d8fbc2f47fbea40de0ad793510e831f1e0194099c48768be9e796c70c53. If the article cannot be accessed, summarize what it is about."
   #prompt = "give me the text from the article at https://finnhub.io/api/news?id=63bc3d8fbc2f47fbea40de0ad793510e831f1e0194099c48768be9e796c70c53"
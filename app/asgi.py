@@ -0,0 +1,119 @@
+import asyncio
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+
+POLL_INTERVAL = 0.25  # Seconds between checks for new job events
+KEEP_ALIVE_INTERVAL = 15  # Seconds of silence before a keep-alive comment is sent
+
+JOB_EVENTS_PATH = re.compile(r'^/jobs/(?P<job_id>[0-9a-f-]+)/events$')
+
+
+def create_asgi_app(flask_app=None):
+  """Wrap the Flask app in an ASGI app that serves the SSE endpoints as coroutines.
+
+  /make_prediction, /make_predictions and /jobs/<id>/events are handled here:
+  the job is submitted on a worker thread and its events are then streamed
+  by a cheap coroutine instead of a pinned WSGI worker. Every other request
+  is passed through to Flask.
+  """
+  flask_app = flask_app or create_app()
+  wsgi_app = WsgiToAsgi(flask_app)
+  allowed_origins = set(flask_app.config['CORS_ORIGINS'])
+
+  # Import after create_app so the models are bound to the initialised app
+  from app import pipeline
+  from app.ai import load_classifier
+  from app.jobs import format_sse, scheduler
+
+  load_classifier()
+
+  def submit(func, *args):
+    with flask_app.app_context():
+      return func(*args)
+
+  async def send_json(send, status, body, headers):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+  async def stream_job(receive, send, job, headers):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers + [
+      (b'content-type', b'text/event-stream'),
+      (b'cache-control', b'no-cache'),
+      (b'connection', b'keep-alive')
+    ]})
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+      while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+          disconnected.set()
+          return
+
+    watcher = asyncio.create_task(watch_disconnect())
+    loop = asyncio.get_running_loop()
+    last_sent = loop.time()
+    index = 0
+    try:
+      while not disconnected.is_set():
+        # Read done before the events so no event published before finishing is missed
+        done = job.done
+        events = job.events[index:]
+        index += len(events)
+        for event in events:
+          await send({'type': 'http.response.body', 'body': format_sse(event, job.id).encode(), 'more_body': True})
+          last_sent = loop.time()
+        if done:
+          break
+        if loop.time() - last_sent > KEEP_ALIVE_INTERVAL:
+          await send({'type': 'http.response.body', 'body': format_sse(None, job.id).encode(), 'more_body': True})
+          last_sent = loop.time()
+        await asyncio.sleep(POLL_INTERVAL)
+      await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+      watcher.cancel()
+
+  async def application(scope, receive, send):
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+      return await wsgi_app(scope, receive, send)
+
+    path = scope['path']
+    job_match = JOB_EVENTS_PATH.match(path)
+    if path not in ('/make_prediction', '/make_predictions') and not job_match:
+      return await wsgi_app(scope, receive, send)
+
+    # Mirror the Flask-CORS policy for the endpoints handled here
+    headers = []
+    origin = dict(scope['headers']).get(b'origin', b'').decode()
+    if origin in allowed_origins:
+      headers.append((b'access-control-allow-origin', origin.encode()))
+
+    args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+    date_str = args.get('date') or datetime.now().strftime('%Y-%m-%d')
+
+    if job_match:
+      job = scheduler.get(job_match.group('job_id'))
+      if job is None:
+        return await send_json(send, 404, {'error': 'Job not found'}, headers)
+    elif path == '/make_prediction':
+      if not args.get('symbol'):
+        return await send_json(send, 400, {'status': 'error', 'message': 'Symbol is required'}, headers)
+      job = await asyncio.to_thread(submit, pipeline.submit_prediction, args['symbol'], date_str)
+    else:
+      symbols = [symbol.strip().upper() for symbol in args.get('symbols', '').split(',') if symbol.strip()]
+      if not symbols:
+        return await send_json(send, 400, {'status': 'error', 'message': 'Symbols are required'}, headers)
+      job = await asyncio.to_thread(submit, pipeline.submit_predictions, symbols, date_str)
+
+    await stream_job(receive, send, job, headers)
+
+  return application
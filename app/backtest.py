@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from app import db
+from app.storage.db_models import ClosingPrice, PredictionSummary
+
+HORIZONS = [1, 2, 3, 7]  # Days ahead a position is held
+TRADING_DAYS_PER_YEAR = 252
+
+
+def load_data():
+    """Load every prediction with its forward returns into NumPy arrays, ordered by time
+
+    Returns a dict with 'signal' (net probability per article in [-1, 1]),
+    'returns' (shape (len(HORIZONS), N), NaN where no price is known),
+    'symbols' and 'dates'.
+    """
+    predictions = pd.read_sql(
+        db.select(
+            PredictionSummary.symbol,
+            PredictionSummary.date_time,
+            PredictionSummary.positive_count,
+            PredictionSummary.negative_count,
+            PredictionSummary.neutral_count,
+            PredictionSummary.positive_probability,
+            PredictionSummary.negative_probability,
+            PredictionSummary.stock_value
+        ).order_by(PredictionSummary.date_time),
+        db.session.connection()
+    )
+    prices = pd.read_sql(
+        db.select(ClosingPrice.symbol, ClosingPrice.date_time, ClosingPrice.closing_price)
+        .where(ClosingPrice.closing_price.isnot(None)),
+        db.session.connection()
+    )
+
+    predictions['date'] = pd.to_datetime(predictions['date_time']).dt.normalize()
+    prices['date_time'] = pd.to_datetime(prices['date_time'])
+    price_index = prices.set_index(['symbol', 'date_time'])['closing_price']
+
+    articles = predictions[['positive_count', 'negative_count', 'neutral_count']].sum(axis=1).to_numpy(dtype=float)
+    net = (predictions['positive_probability'].astype(float) - predictions['negative_probability'].astype(float)).to_numpy()
+    signal = np.divide(net, articles, out=np.zeros_like(net), where=articles > 0)
+
+    base = predictions['stock_value'].to_numpy(dtype=float)
+    returns = np.full((len(HORIZONS), len(predictions)), np.nan)
+    for i, horizon in enumerate(HORIZONS):
+        keys = pd.MultiIndex.from_arrays([predictions['symbol'], predictions['date'] + pd.Timedelta(days=horizon)])
+        future = price_index.reindex(keys).to_numpy(dtype=float)
+        returns[i] = np.divide(future, base, out=np.full_like(future, np.nan), where=base > 0) - 1
+
+    return {
+        'signal': signal,
+        'returns': returns,
+        'symbols': predictions['symbol'].to_numpy(),
+        'dates': predictions['date'].to_numpy()
+    }
+
+
+def _evaluate(signal, returns, thresholds, horizons, allow_short):
+    # Metrics for a (horizons, thresholds) grid, each as an array of shape (H, T)
+    signal = signal[None, None, :]  # (1, 1, N)
+    returns = returns[:, None, :]  # (H, 1, N)
+    limits = thresholds[None, :, None]  # (1, T, 1)
+
+    position = (signal > limits).astype(float)
+    if allow_short:
+        position -= (signal < -limits)
+    known = ~np.isnan(returns)
+    position = np.where(known, position, 0.0)  # Predictions without a future price don't trade
+
+    strategy = position * np.nan_to_num(returns)  # (H, T, N)
+    trades = (position != 0).sum(axis=2)
+    hits = ((strategy > 0) & (position != 0)).sum(axis=2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = strategy.sum(axis=2) / trades
+        squared = np.where(position != 0, (strategy - mean[..., None]) ** 2, 0.0).sum(axis=2)
+        std = np.sqrt(squared / (trades - 1))
+        horizon_days = np.array(horizons, dtype=float)[:, None]
+        sharpe = mean / std * np.sqrt(TRADING_DAYS_PER_YEAR / horizon_days)
+        hit_rate = hits / trades
+
+    equity = np.cumsum(strategy, axis=2)
+    drawdown = (np.maximum.accumulate(equity, axis=2) - equity).max(axis=2, initial=0.0)
+    total = equity[..., -1] if equity.shape[2] else np.zeros(trades.shape)
+
+    return {'trades': trades, 'hit_rate': hit_rate, 'total_return': total, 'mean_return': mean,
+            'sharpe': sharpe, 'max_drawdown': drawdown}
+
+
+def run_backtest(data, thresholds, horizons=None, allow_short=True, max_cells=5_000_000):
+    """Evaluate a threshold strategy for every (threshold, horizon) combination
+
+    The strategy goes long when the signal is above the threshold and, if
+    allow_short, short when it is below -threshold. Metrics are computed with
+    broadcasting over a (horizons, thresholds, predictions) grid; thresholds
+    are only split into chunks to keep that grid under max_cells elements.
+
+    Returns a list of result dicts, one per combination.
+    """
+    horizons = horizons or HORIZONS
+    thresholds = np.asarray(thresholds, dtype=float)
+    returns = data['returns'][[HORIZONS.index(horizon) for horizon in horizons]]
+
+    chunk = max(1, max_cells // max(1, len(horizons) * len(data['signal'])))
+    parts = [_evaluate(data['signal'], returns, thresholds[start:start + chunk], horizons, allow_short)
+             for start in range(0, len(thresholds), chunk)]
+    metrics = {name: np.concatenate([part[name] for part in parts], axis=1) for name in parts[0]} if parts else {}
+
+    results = []
+    for h, horizon in enumerate(horizons):
+        for t, threshold in enumerate(thresholds):
+            results.append({
+                'horizon': horizon,
+                'threshold': round(float(threshold), 6),
+                'trades': int(metrics['trades'][h, t]),
+                **{name: _finite(metrics[name][h, t])
+                   for name in ('hit_rate', 'total_return', 'mean_return', 'sharpe', 'max_drawdown')}
+            })
+    return results
+
+
+def _finite(value):
+    return round(float(value), 6) if np.isfinite(value) else None
+
+
+def sweep(min_threshold=0.0, max_threshold=1.0, steps=1000, horizons=None, allow_short=True, sort_by='sharpe', top=20):
+    """Load the data once and rank `steps` thresholds for each horizon"""
+    data = load_data()
+    thresholds = np.linspace(min_threshold, max_threshold, steps)
+    results = run_backtest(data, thresholds, horizons=horizons, allow_short=allow_short)
+    results.sort(key=lambda result: result[sort_by] if result[sort_by] is not None else float('-inf'), reverse=True)
+    return {
+        'predictions': int(len(data['signal'])),
+        'combinations': len(results),
+        'results': results[:top]
+    }
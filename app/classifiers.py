@@ -0,0 +1,416 @@
+import json
+import os
+import re
+import threading
+import time
+from importlib.util import find_spec
+
+from dotenv import load_dotenv
+
+from config import Config
+
+load_dotenv()
+
+PROMPT_VERSION = 1  # Bump whenever the prompts change so cached classifications are not reused
+SENTIMENTS = ["positive", "negative", "neutral"]
+
+
+class ClassificationError(Exception):
+  """Raised when no classifier backend could classify a text"""
+
+
+def build_classification(sentiment, probability):
+  # Normalize a parsed (sentiment, probability) pair into the classification result shape
+  sentiment = str(sentiment).lower()
+  try:
+    # Ensure probability is between 0 and 1
+    probability = max(0.0, min(1.0, float(probability)))
+  except (TypeError, ValueError):
+    probability = 0.5  # Default probability if parsing fails
+
+  # Ensure sentiment is one of the expected values
+  if sentiment not in SENTIMENTS:
+    sentiment = "neutral"
+
+  return {
+      "sentiment": sentiment.capitalize(),
+      "probabilities": {
+          "Positive": probability if sentiment == "positive" else 0.0,
+          "Negative": probability if sentiment == "negative" else 0.0,
+          "Neutral": probability if sentiment == "neutral" else 0.0
+      },
+  }
+
+
+def _single_prompt(text):
+  return f"""Analyze the sentiment of this financial news text and respond with ONLY the sentiment classification and probability score in this exact format:
+              sentiment probability
+                Where sentiment must be exactly one of: positive, negative, neutral
+                And probability must be a number between 0 and 1 (e.g., 0.85)
+
+                Text to analyze: {text}
+
+                Respond with only the sentiment and probability, nothing else."""
+
+
+def _batch_prompt(texts):
+  items = "\n".join(f"{i}: {json.dumps(text)}" for i, text in enumerate(texts))
+  return f"""Analyze the sentiment of each of the following financial news texts.
+              Respond with ONLY a JSON object of this exact form:
+                {{"results": [{{"index": 0, "sentiment": "positive", "probability": 0.85}}, ...]}}
+                with one entry per text, where sentiment must be exactly one of: positive, negative, neutral
+                and probability must be a number between 0 and 1.
+
+                Texts to analyze (index: text):
+                {items}"""
+
+
+def _parse_single(response):
+  # "sentiment probability" -> classification, None if the answer doesn't have that shape
+  parts = response.strip().split()
+  if len(parts) >= 2 and parts[0].lower() in SENTIMENTS:
+    return build_classification(parts[0], parts[1])
+  return None
+
+
+def _parse_batch(content, count):
+  """Parse a {"results": [...]} answer into a list aligned with the texts, None where unanswered"""
+  results = [None] * count
+  match = re.search(r'\{.*\}', content, re.DOTALL)  # Tolerate text around the JSON object
+  if not match:
+    return results
+  try:
+    parsed = json.loads(match.group(0))
+  except ValueError:
+    return results
+
+  for item in parsed.get("results", []):
+    try:
+      index = int(item["index"])
+      sentiment = str(item["sentiment"]).lower()
+      probability = float(item["probability"])
+    except (KeyError, TypeError, ValueError):
+      continue
+    if 0 <= index < count and sentiment in SENTIMENTS:
+      results[index] = build_classification(sentiment, probability)
+  return results
+
+
+class ClassifierBackend:
+  """A way of classifying texts.
+
+  classify() takes a list of texts and returns a list aligned with it, with
+  None for texts it couldn't answer. Errors (including timeouts) are raised so
+  the router can count them and fall back to another backend.
+  """
+
+  name = None
+  model = None  # Part of the cache key, so results of different models never mix
+  last_resort = False  # Only tried after every other backend
+
+  def available(self):
+    # Whether the backend is configured and its dependencies are installed
+    return True
+
+  def classify(self, texts):
+    raise NotImplementedError
+
+
+class LLMBackend(ClassifierBackend):
+  """Shared prompting for the chat model backends: one request per batch, single requests for leftovers"""
+
+  def __init__(self, model, timeout):
+    self.model = model
+    self.timeout = timeout
+    self._client = None
+
+  def _complete(self, prompt, json_mode=False):
+    raise NotImplementedError
+
+  def classify(self, texts):
+    if len(texts) == 1:
+      return [_parse_single(self._complete(_single_prompt(texts[0])))]
+
+    results = _parse_batch(self._complete(_batch_prompt(texts), json_mode=True), len(texts))
+    for i, text in enumerate(texts):
+      if results[i] is None:
+        # Retry entries the batch answer didn't cover one by one
+        try:
+          results[i] = _parse_single(self._complete(_single_prompt(text)))
+        except Exception as e:
+          # Keep the answers already paid for, the router sends only the unanswered texts to a fallback
+          print(f"Error in {self.name} single retry, leaving the rest of the batch unanswered: {e}")
+          break
+    return results
+
+
+class OpenAIBackend(LLMBackend):
+  name = "openai"
+
+  def available(self):
+    return bool(os.environ.get("GPT_API_KEY")) and find_spec("openai") is not None
+
+  def _complete(self, prompt, json_mode=False):
+    if self._client is None:
+      import openai
+      self._client = openai.OpenAI(api_key=os.environ.get("GPT_API_KEY"), timeout=self.timeout, max_retries=0)
+
+    completion = self._client.chat.completions.create(
+        model=self.model,
+        messages=[
+          {"role": "user", "content": prompt}
+        ],
+        temperature=0.1,  # Low temperature for more consistent outputs
+        **({"response_format": {"type": "json_object"}} if json_mode else {})
+      )
+    return completion.choices[0].message.content
+
+
+class AnthropicBackend(LLMBackend):
+  name = "anthropic"
+
+  def available(self):
+    return bool(os.environ.get("CLAUDE_API_KEY")) and find_spec("anthropic") is not None
+
+  def _complete(self, prompt, json_mode=False):
+    if self._client is None:
+      import anthropic
+      self._client = anthropic.Anthropic(api_key=os.environ.get("CLAUDE_API_KEY"), timeout=self.timeout, max_retries=0)
+
+    message = self._client.messages.create(
+        model=self.model,
+        max_tokens=4000,
+        temperature=0.1,
+        messages=[
+          {"role": "user", "content": prompt}
+        ]
+      )
+    return message.content[0].text
+
+
+class LocalBackend(ClassifierBackend):
+  """The local FinBERT model, see app/finbert.py"""
+
+  name = "finbert"
+
+  def __init__(self, model):
+    self.model = model
+
+  def available(self):
+    return find_spec("torch") is not None and find_spec("transformers") is not None
+
+  def classify(self, texts):
+    from app.finbert import finbert
+    return finbert.classify(texts)
+
+
+class LexiconBackend(ClassifierBackend):
+  """Word list classifier, crude but instant and always available as the last fallback"""
+
+  name = "lexicon"
+  model = "lexicon-v1"
+  last_resort = True
+
+  POSITIVE = {
+    "beat", "beats", "surge", "surges", "soar", "soars", "jump", "jumps", "rally", "rallies", "gain", "gains",
+    "rise", "rises", "record", "growth", "profit", "profitable", "upgrade", "upgraded", "outperform", "strong",
+    "bullish", "raise", "raises", "raised", "boost", "boosts", "exceed", "exceeds", "win", "wins", "approval",
+    "approved", "expands", "expansion", "buyback", "dividend", "optimistic", "rebound", "rebounds"
+  }
+  NEGATIVE = {
+    "miss", "misses", "missed", "fall", "falls", "drop", "drops", "plunge", "plunges", "slump", "slumps",
+    "decline", "declines", "loss", "losses", "downgrade", "downgraded", "underperform", "weak", "bearish",
+    "cut", "cuts", "lawsuit", "probe", "investigation", "recall", "fraud", "layoffs", "bankruptcy", "warning",
+    "warns", "delay", "delays", "fine", "fined", "sink", "sinks", "tumble", "tumbles", "concern", "concerns"
+  }
+  WORD = re.compile(r"[a-z]+")
+
+  def classify(self, texts):
+    results = []
+    for text in texts:
+      words = self.WORD.findall((text or "").lower())
+      positive = sum(1 for word in words if word in self.POSITIVE)
+      negative = sum(1 for word in words if word in self.NEGATIVE)
+      if positive == negative:
+        results.append(build_classification("neutral", 0.5))
+      else:
+        sentiment = "positive" if positive > negative else "negative"
+        # More one-sided hits give more confidence, capped well below the model backends
+        results.append(build_classification(sentiment, 0.5 + 0.3 * abs(positive - negative) / (positive + negative)))
+    return results
+
+
+class CircuitBreaker:
+  """Stops calling a backend after `failure_threshold` consecutive failures.
+
+  After `reset_seconds` one trial call is let through (half open); it closes
+  the breaker on success and opens it again on failure.
+  """
+
+  def __init__(self, failure_threshold=5, reset_seconds=60):
+    self.failure_threshold = failure_threshold
+    self.reset_seconds = reset_seconds
+    self.failures = 0
+    self.opened_at = None
+    self._trial_running = False
+    self._lock = threading.Lock()
+
+  @property
+  def state(self):
+    if self.opened_at is None:
+      return "closed"
+    return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+  def allow(self):
+    with self._lock:
+      state = self.state
+      if state == "closed":
+        return True
+      if state == "half_open" and not self._trial_running:
+        self._trial_running = True
+        return True
+      return False
+
+  def record_success(self):
+    with self._lock:
+      self.failures = 0
+      self.opened_at = None
+      self._trial_running = False
+
+  def record_failure(self):
+    with self._lock:
+      self.failures += 1
+      self._trial_running = False
+      if self.opened_at is not None or self.failures >= self.failure_threshold:
+        self.opened_at = time.monotonic()
+
+
+class BackendStats:
+  """Exponentially weighted latency per text and error rate of one backend"""
+
+  ALPHA = 0.2  # Weight of the newest observation
+
+  def __init__(self):
+    self.calls = 0
+    self.errors = 0
+    self.latency = None  # Seconds per text
+    self.error_rate = 0.0
+
+  def record(self, seconds_per_text=None, error=False):
+    self.calls += 1
+    self.errors += int(error)
+    self.error_rate += self.ALPHA * (float(error) - self.error_rate)
+    if seconds_per_text is not None:
+      self.latency = seconds_per_text if self.latency is None else \
+        self.latency + self.ALPHA * (seconds_per_text - self.latency)
+
+
+class ClassifierRouter:
+  """Classifies texts with the preferred backend, falling back to the others.
+
+  The first configured backend is preferred. When it fails, times out or its
+  circuit is open, the remaining texts go to the other backends ordered by
+  error rate and then latency; last resort backends (the lexicon) are always
+  tried last. Every result records the backend that produced it.
+  """
+
+  def __init__(self, backends, failure_threshold=5, reset_seconds=60):
+    self.backends = [backend for backend in backends if backend.available()]
+    if not self.backends:
+      # Nothing configured is usable, keep the lexicon so classification never stops entirely
+      print("WARNING: no configured classifier backend is available (missing API keys or packages?), "
+            "classifying with the lexicon only")
+      self.backends = [LexiconBackend()]
+    elif backends and self.backends[0] is not backends[0]:
+      print(f"WARNING: classifier backend {backends[0].name} is not available, "
+            f"using {self.backends[0].name} as the preferred backend")
+    self.breakers = {backend.name: CircuitBreaker(failure_threshold, reset_seconds) for backend in self.backends}
+    self.stats_by_backend = {backend.name: BackendStats() for backend in self.backends}
+    self._lock = threading.Lock()
+
+  @property
+  def primary(self):
+    return self.backends[0]
+
+  def ordered(self):
+    """Backends in the order they should be tried"""
+    def score(backend):
+      stats = self.stats_by_backend[backend.name]
+      latency = stats.latency if stats.latency is not None else float("inf")
+      return (backend.last_resort, round(stats.error_rate, 1), latency)
+
+    return [self.primary] + sorted(self.backends[1:], key=score)
+
+  def classify(self, texts):
+    """Classify texts, returning a list aligned with them with None where every backend failed"""
+    results = [None] * len(texts)
+    pending = list(range(len(texts)))
+
+    for backend in self.ordered():
+      if not pending:
+        break
+      breaker = self.breakers[backend.name]
+      if not breaker.allow():
+        continue
+
+      start = time.perf_counter()
+      try:
+        answers = backend.classify([texts[i] for i in pending])
+      except Exception as e:
+        print(f"Error in {backend.name} classification: {e}")
+        breaker.record_failure()
+        with self._lock:
+          self.stats_by_backend[backend.name].record(error=True)
+        continue
+
+      answered = [(i, answer) for i, answer in zip(pending, answers) if answer is not None]
+      with self._lock:
+        self.stats_by_backend[backend.name].record(
+          (time.perf_counter() - start) / len(pending), error=not answered
+        )
+      if answered:
+        breaker.record_success()
+      else:
+        breaker.record_failure()
+
+      for i, answer in answered:
+        results[i] = {**answer, "backend": backend.name}
+      pending = [i for i in pending if results[i] is None]
+
+    return results
+
+  def stats(self):
+    """Circuit state, error rate and latency of every backend, in fallback order"""
+    result = {}
+    with self._lock:
+      for backend in self.ordered():
+        stats = self.stats_by_backend[backend.name]
+        result[backend.name] = {
+          "model": backend.model,
+          "circuit": self.breakers[backend.name].state,
+          "calls": stats.calls,
+          "errors": stats.errors,
+          "error_rate": round(stats.error_rate, 4),
+          "seconds_per_text": round(stats.latency, 4) if stats.latency is not None else None
+        }
+    return result
+
+
+def create_backend(name):
+  """Backend for a CLASSIFIER_BACKENDS entry"""
+  if name == "openai":
+    return OpenAIBackend(Config.OPENAI_MODEL, Config.CLASSIFIER_TIMEOUT)
+  if name == "anthropic":
+    return AnthropicBackend(Config.ANTHROPIC_MODEL, Config.CLASSIFIER_TIMEOUT)
+  if name == "finbert":
+    return LocalBackend(Config.FINBERT_MODEL)
+  if name == "lexicon":
+    return LexiconBackend()
+  raise ValueError(f"Unknown classifier backend: {name}")
+
+
+router = ClassifierRouter(
+  [create_backend(name.strip()) for name in Config.CLASSIFIER_BACKENDS.split(",") if name.strip()],
+  failure_threshold=Config.CLASSIFIER_BREAKER_FAILURES,
+  reset_seconds=Config.CLASSIFIER_BREAKER_RESET
+)
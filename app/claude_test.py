@@ -1,6 +1,5 @@
 import os
 import requests
-import anthropic
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +10,7 @@ _client = None
 def get_anthropic_client():
     global _client
     if _client is None:
+        import anthropic
         _client = anthropic.Anthropic(api_key=os.environ.get("CLAUDE_API_KEY"))
     return _client
 
@@ -0,0 +1,580 @@
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import click
+import requests
+from flask import current_app
+from sqlalchemy.orm import Session
+
+from app import db
+from app.ai import classify_concurrently
+from app.storage.db_models import ClosingPrice, Company, PredictionSummary
+from app.storage.storage import (
+  FUTURE_DAYS,
+  get_all_predictions,
+  prediction_for_company_and_date_query,
+  predictions_since_query,
+  save_predictions
+)
+from app.storage.outcomes import rebuild_outcomes
+
+
+def _stub_classifier(delay):
+  # Stand-in for classify_texts that only simulates one network round-trip per batch
+  def classify(texts):
+    time.sleep(delay)
+    return [{
+        "sentiment": "Neutral",
+        "probabilities": {"Positive": 0.0, "Negative": 0.0, "Neutral": 1.0}
+    } for _ in texts]
+  return classify
+
+
+@click.command('benchmark-classification')
+@click.option('--articles', default=150, help='Number of fake articles to classify')
+@click.option('--delay', default=0.5, help='Simulated seconds per classification request')
+@click.option('--workers', default='1,4,8,16', help='Comma separated worker counts to compare')
+@click.option('--batch-size', default=1, help='Articles per simulated request')
+def benchmark_classification(articles, delay, workers, batch_size):
+  """Benchmark the concurrent classification stage with a stub classifier"""
+  texts = [f"Article {i}" for i in range(articles)]
+  classifier = _stub_classifier(delay)
+
+  for max_workers in [int(w) for w in workers.split(',')]:
+    start = time.perf_counter()
+    results = list(classify_concurrently(texts, classifier=classifier, max_workers=max_workers,
+                                         batch_size=batch_size, use_cache=False))
+    elapsed = time.perf_counter() - start
+    click.echo(f"workers={max_workers:>3}  batch={batch_size:>3}  articles={len(results)}  {elapsed:.2f}s  "
+               f"({len(results) / elapsed:.1f} articles/s)")
+
+
+@click.command('benchmark-finbert')
+@click.option('--articles', default=256, help='Number of sample headlines to classify')
+@click.option('--batch-sizes', default='1,8,16,32,64', help='Comma separated batch sizes to compare')
+@click.option('--threads', default=None, type=int, help='torch threads, defaults to FINBERT_THREADS')
+@click.option('--quantize', default=None, type=click.Choice(['none', 'int8', 'onnx']),
+              help='Model variant, defaults to FINBERT_QUANTIZE')
+def benchmark_finbert(articles, batch_sizes, threads, quantize):
+  """Report local FinBERT throughput in articles per second at several batch sizes"""
+  from app.finbert import FinbertClassifier
+
+  headlines = [
+    "{} shares jump after quarterly earnings beat analyst estimates",
+    "{} cuts full-year guidance as demand weakens in key markets",
+    "{} announces board changes ahead of annual shareholder meeting",
+    "Regulators open an investigation into {} accounting practices",
+  ]
+  texts = [headlines[i % len(headlines)].format(f"Company {i}") for i in range(articles)]
+
+  classifier = FinbertClassifier(
+    model_name=current_app.config['FINBERT_MODEL'],
+    threads=threads or current_app.config['FINBERT_THREADS'],
+    quantize=quantize or current_app.config['FINBERT_QUANTIZE']
+  )
+  start = time.perf_counter()
+  classifier.load()
+  click.echo(f"model={classifier.model_name}  quantize={classifier.quantize}  threads={classifier.threads}  "
+             f"load {time.perf_counter() - start:.1f}s")
+  classifier.classify(texts[:8])  # Warm up
+
+  for batch_size in [int(b) for b in batch_sizes.split(',')]:
+    classifier.batch_size = batch_size
+    start = time.perf_counter()
+    results = classifier.classify(texts)
+    elapsed = time.perf_counter() - start
+    click.echo(f"batch={batch_size:>3}  articles={len(results)}  {elapsed:.2f}s  "
+               f"({len(results) / elapsed:.1f} articles/s)")
+
+
+def _get_all_predictions_per_row():
+  # The previous implementation: one query for the list plus one per future price
+  predictions = db.session.query(PredictionSummary, Company).join(
+    Company, PredictionSummary.symbol == Company.symbol
+  ).order_by(PredictionSummary.date_time.desc()).all()
+
+  for prediction in predictions:
+    base_date = prediction.PredictionSummary.date_time.date()
+    for days_ahead in FUTURE_DAYS:
+      ClosingPrice.query.filter_by(
+        symbol=prediction.PredictionSummary.symbol,
+        date_time=base_date + timedelta(days=days_ahead)
+      ).first()
+  return predictions
+
+
+@click.command('benchmark-predictions')
+@click.option('--count', default=10000, help='Number of predictions to seed')
+def benchmark_predictions(count):
+  """Compare /predictions query latency before and after the single query rewrite
+
+  Seed data is written inside a transaction that is rolled back afterwards.
+  """
+  try:
+    _seed_predictions('BENCH', count)
+    click.echo(f"Seeded {count} predictions")
+
+    for name, fetch in [('per row queries', _get_all_predictions_per_row), ('single query', get_all_predictions)]:
+      start = time.perf_counter()
+      rows = fetch()
+      elapsed = time.perf_counter() - start
+      click.echo(f"{name:<16} rows={len(rows)}  {elapsed * 1000:.0f}ms")
+  finally:
+    db.session.rollback()
+
+
+def _seed_predictions(symbol, count, start_date=datetime(2000, 1, 1)):
+  # Insert one random prediction per day plus closing prices for a new symbol, without committing
+  db.session.add(Company(symbol=symbol, name='Benchmark Inc.'))
+  db.session.flush()
+  db.session.bulk_insert_mappings(PredictionSummary, [{
+    'symbol': symbol,
+    'date_time': start_date + timedelta(days=i),
+    'prediction_date': (start_date + timedelta(days=i)).date(),
+    'positive_count': random.randint(0, 50),
+    'negative_count': random.randint(0, 50),
+    'neutral_count': random.randint(0, 50),
+    'positive_probability': random.uniform(0, 50),
+    'negative_probability': random.uniform(0, 50),
+    'neutral_probability': random.uniform(0, 50),
+    'stock_value': random.uniform(10, 500)
+  } for i in range(count)])
+  db.session.bulk_insert_mappings(ClosingPrice, [{
+    'symbol': symbol,
+    'date_time': (start_date + timedelta(days=i)).date(),
+    'closing_price': random.uniform(10, 500)
+  } for i in range(count + max(FUTURE_DAYS))])
+  db.session.flush()
+
+
+SEED_SYMBOL = '_SEED'  # Can't be a real ticker, so seeding never touches an existing company
+
+
+@contextmanager
+def _rolled_back_session():
+  """Point db.session at a transaction that is always rolled back
+
+  Commits inside only release a savepoint, so code that commits (like
+  save_predictions) can run against the real schema without leaving
+  anything behind.
+  """
+  connection = db.engine.connect()
+  transaction = connection.begin()
+  session = Session(bind=connection, join_transaction_mode='create_savepoint')
+  original = db.session.registry()
+  db.session.registry.set(session)
+  try:
+    yield
+  finally:
+    session.close()
+    db.session.registry.set(original)
+    transaction.rollback()
+    connection.close()
+
+
+def _save_seed_predictions(symbol, count, start_date=datetime(2000, 1, 1)):
+  # Save one random prediction per day for a new symbol through save_predictions
+  db.session.add(Company(symbol=symbol, name='Benchmark Inc.'))
+  db.session.commit()
+  statuses = save_predictions([dict(
+    symbol=symbol,
+    date_time=start_date + timedelta(days=i),
+    positive_count=random.randint(0, 50),
+    negative_count=random.randint(0, 50),
+    neutral_count=random.randint(0, 50),
+    positive_probability=random.uniform(0, 50),
+    negative_probability=random.uniform(0, 50),
+    neutral_probability=random.uniform(0, 50),
+    stock_value=random.uniform(10, 500),
+    news_articles=[],
+    classifications=[]
+  ) for i in range(count)])
+  saved = statuses.count('saved')
+  if saved != count:
+    raise click.ClickException(f"Only {saved} of {count} seed predictions were saved")
+
+
+def _explain(query):
+  # EXPLAIN a query with its bound parameters, returning the plan as text
+  connection = db.session.connection()
+  compiled = query.statement.compile(dialect=connection.dialect)
+  rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+  return '\n'.join(row[0] for row in rows)
+
+
+@click.command('check-date-lookups')
+@click.option('--count', default=20000, help='Number of predictions to seed')
+def check_date_lookups(count):
+  """Assert that the prediction day lookups are answered by an index scan
+
+  Saves predictions for a seed symbol the same way predictions are saved,
+  inside a transaction that is rolled back afterwards, then EXPLAINs the
+  existence check and the closing price refresh query. Fails if either plan
+  scans prediction_summaries sequentially.
+  """
+  with _rolled_back_session():
+    _save_seed_predictions(SEED_SYMBOL, count)
+    db.session.execute(db.text('ANALYZE prediction_summaries'))
+    # Only the last few days should be read, like a routine price refresh
+    cutoff_date = (datetime(2000, 1, 1) + timedelta(days=count - 5)).date()
+
+    failures = []
+    for name, query in [
+      ('prediction exists', prediction_for_company_and_date_query(SEED_SYMBOL, cutoff_date)),
+      ('predictions since', predictions_since_query(cutoff_date)),
+    ]:
+      plan = _explain(query)
+      click.echo(f"{name}:\n{plan}\n")
+      if 'Seq Scan on prediction_summaries' in plan or 'Index' not in plan:
+        failures.append(name)
+
+  if failures:
+    raise click.ClickException(f"Not using an index: {', '.join(failures)}")
+  click.echo("Index scans OK")
+
+
+async def _open_stream(host, port, path, duration, results):
+  # Hold one SSE connection open for `duration` seconds, recording time to first byte and messages received
+  start = time.perf_counter()
+  try:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+
+    status_line = await asyncio.wait_for(reader.readline(), timeout=duration)
+    if b' 200 ' not in status_line:
+      results['failed'] += 1
+      return
+    results['first_byte'].append(time.perf_counter() - start)
+    results['open'] += 1
+
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+      line = await asyncio.wait_for(reader.readline(), timeout=max(0.01, deadline - time.perf_counter()))
+      if not line:
+        break
+      if line.startswith(b'data:') or line.startswith(b': keep-alive'):
+        results['messages'] += 1
+    writer.close()
+  except asyncio.TimeoutError:
+    pass
+  except OSError:
+    results['failed'] += 1
+
+
+@click.command('loadtest-sse')
+@click.option('--url', default='http://localhost:5000/make_prediction?symbol=AAPL', help='SSE endpoint to open')
+@click.option('--streams', default='100,500,1000', help='Comma separated numbers of concurrent streams')
+@click.option('--duration', default=20.0, help='Seconds to hold each stream open')
+def loadtest_sse(url, streams, duration):
+  """Open many concurrent SSE streams against a running server and report how many it sustains
+
+  Identical requests share one job, so the load is almost entirely the cost of
+  the open streams themselves.
+  """
+  parts = urlsplit(url)
+  path = parts.path + (f"?{parts.query}" if parts.query else '')
+
+  for count in [int(n) for n in streams.split(',')]:
+    results = {'open': 0, 'failed': 0, 'messages': 0, 'first_byte': []}
+
+    async def run():
+      await asyncio.gather(*[_open_stream(parts.hostname, parts.port or 80, path, duration, results)
+                             for _ in range(count)])
+
+    asyncio.run(run())
+    first_byte = sorted(results['first_byte'])
+    p95 = first_byte[int(len(first_byte) * 0.95) - 1] if first_byte else float('nan')
+    click.echo(f"streams={count:>5}  open={results['open']:>5}  failed={results['failed']:>5}  "
+               f"messages={results['messages']:>6}  first byte p95={p95 * 1000:.0f}ms")
+
+
+@click.command('rebuild-outcomes')
+def rebuild_outcomes_command():
+  """Recompute prediction outcomes and accuracy counters from all stored predictions and prices"""
+  rebuild_outcomes()
+  click.echo("Prediction outcomes rebuilt")
+
+
+@click.command('backtest')
+@click.option('--min-threshold', default=0.0, help='Smallest signal threshold to test')
+@click.option('--max-threshold', default=1.0, help='Largest signal threshold to test')
+@click.option('--steps', default=1000, help='Number of thresholds between min and max')
+@click.option('--horizons', default='1,2,3,7', help='Comma separated holding periods in days')
+@click.option('--long-only', is_flag=True, help='Only go long on positive signals')
+@click.option('--sort-by', default='sharpe', type=click.Choice(['sharpe', 'hit_rate', 'total_return', 'mean_return']))
+@click.option('--top', default=20, help='Number of best combinations to print')
+def backtest_command(min_threshold, max_threshold, steps, horizons, long_only, sort_by, top):
+  """Backtest the sentiment signal across a sweep of thresholds"""
+  from app.backtest import sweep
+
+  start = time.perf_counter()
+  result = sweep(min_threshold, max_threshold, steps, horizons=[int(h) for h in horizons.split(',')],
+                 allow_short=not long_only, sort_by=sort_by, top=top)
+  elapsed = time.perf_counter() - start
+
+  click.echo(f"{result['predictions']} predictions, {result['combinations']} combinations in {elapsed:.2f}s")
+  click.echo(f"{'horizon':>7} {'threshold':>9} {'trades':>6} {'hit rate':>8} {'total':>8} {'sharpe':>7} {'drawdown':>8}")
+  for r in result['results']:
+    click.echo(f"{r['horizon']:>7} {r['threshold']:>9.4f} {r['trades']:>6} {r['hit_rate'] or 0:>8.3f} "
+               f"{r['total_return'] or 0:>8.3f} {r['sharpe'] or 0:>7.2f} {r['max_drawdown'] or 0:>8.3f}")
+
+
+@click.command('init-db')
+def init_db_command():
+  """Create any missing tables
+
+  Run once when deploying to a new database. Changes to existing tables go
+  through the migrations in migrations/versions.
+  """
+  db.create_all()
+  click.echo("Database tables created")
+
+
+HEAVY_MODULES = ['openai', 'anthropic', 'yfinance', 'pandas', 'numpy', 'torch', 'transformers']
+
+
+def _measure_import_time():
+  # Import the app in a fresh interpreter with -X importtime, returning {module: cumulative seconds} and the total
+  root = os.path.dirname(current_app.root_path)
+  completed = subprocess.run(
+    [sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+    cwd=root, capture_output=True, text=True, check=True
+  )
+
+  modules = {}
+  total = 0
+  for line in completed.stderr.splitlines():
+    # "import time:       self [us] |  cumulative | imported package"
+    if not line.startswith('import time:') or 'self [us]' in line:
+      continue
+    self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+    modules[name] = int(cumulative_us) / 1e6
+    total += int(self_us)
+  return modules, total / 1e6
+
+
+@click.command('check-import-time')
+@click.option('--max-seconds', default=1.5, help='Fail if importing the app takes longer than this')
+@click.option('--forbid', default=','.join(HEAVY_MODULES), help='Comma separated packages that must load lazily')
+@click.option('--top', default=10, help='Number of slowest top level imports to print')
+def check_import_time(max_seconds, forbid, top):
+  """Measure app startup imports with python -X importtime and fail on regressions
+
+  Fails when the total import time exceeds --max-seconds or when one of the
+  --forbid packages is imported while creating the app.
+  """
+  modules, total = _measure_import_time()
+
+  top_level = sorted(((seconds, name) for name, seconds in modules.items() if '.' not in name), reverse=True)
+  for seconds, name in top_level[:top]:
+    click.echo(f"{seconds * 1000:>8.1f}ms  {name}")
+  click.echo(f"total {total * 1000:.1f}ms for {len(modules)} modules")
+
+  forbidden = [package for package in forbid.split(',') if package and package in modules]
+  if forbidden:
+    raise click.ClickException(f"Imported at startup but should load lazily: {', '.join(forbidden)}")
+  if total > max_seconds:
+    raise click.ClickException(f"Import time {total:.2f}s exceeds the {max_seconds:.2f}s budget")
+  click.echo("Import time OK")
+
+
+def _serve_fixture(fixture):
+  # Local stub of the Finnhub API replaying each endpoint's recorded responses in order, the last one repeats
+  requests_seen = []
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      url = urlsplit(self.path)
+      params = dict(parse_qsl(url.query))
+      path = url.path[len('/api/v1'):]
+      requests_seen.append((path, params))
+      responses = fixture.get(path, [{'status': 404, 'body': {'error': 'Not in fixture'}}])
+      response = responses[min(sum(1 for seen, _ in requests_seen if seen == path), len(responses)) - 1]
+
+      body = json.dumps(response.get('body')).encode()
+      self.send_response(response['status'])
+      for name, value in response.get('headers', {}).items():
+        self.send_header(name, value)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, *args):
+      pass
+
+  server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, requests_seen
+
+
+@click.command('check-finnhub-client')
+@click.option('--fixture', default=None, help='Recorded responses, defaults to app/fixtures/finnhub_responses.json')
+def check_finnhub_client(fixture):
+  """Replay recorded Finnhub responses through FinnhubClient and check retries, rate limiting and caching
+
+  Serves the fixture from a local stub server, so nothing leaves the machine.
+  Response cache rows written by the check are deleted afterwards.
+  """
+  from app.finnhub_client import FinnhubClient, TokenBucket
+  from app.storage.db_models import CachedResponse
+  from app.storage.response_cache import response_key
+
+  with open(fixture or os.path.join(current_app.root_path, 'fixtures', 'finnhub_responses.json')) as f:
+    recorded = json.load(f)
+  server, requests_seen = _serve_fixture(recorded)
+  client = FinnhubClient(f"http://127.0.0.1:{server.server_port}/api/v1", 'fixture-token', rate_per_minute=6000,
+                         timeout=(1, 2), max_retries=3, backoff=0.01)
+
+  def hits(endpoint):
+    return sum(1 for path, _ in requests_seen if path == endpoint)
+
+  failures = []
+
+  def check(name, ok):
+    click.echo(f"{'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+      failures.append(name)
+
+  news_params = {'symbol': 'FIXTURE', 'from': '2024-10-16', 'to': '2024-10-18'}
+  cache_key = response_key('/company-news', news_params)
+  try:
+    # 503 and 429 are retried until the recorded 200
+    quote = client.get('/quote', {'symbol': 'FIXTURE'})
+    check('quote retried past 503 and 429', quote == recorded['/quote'][-1]['body'] and hits('/quote') == 3)
+    check('retries recorded in stats', client.stats()['/quote']['retries'] == 2)
+    check('api token sent', all(params.get('token') == 'fixture-token' for _, params in requests_seen))
+
+    # Other client errors fail right away
+    try:
+      client.get('/stock/profile2', {'symbol': 'FIXTURE'})
+      check('404 raises without retrying', False)
+    except requests.HTTPError:
+      check('404 raises without retrying', hits('/stock/profile2') == 1)
+
+    # A cached response is served without another request
+    CachedResponse.query.filter_by(key=cache_key).delete()
+    db.session.commit()
+    first = client.get('/company-news', news_params, ttl=timedelta(minutes=1))
+    second = client.get('/company-news', news_params, ttl=timedelta(minutes=1))
+    check('news served from the cache the second time',
+          first == second == recorded['/company-news'][0]['body'] and hits('/company-news') == 1)
+
+    # 1200/min with a burst of one spaces requests 50ms apart
+    client.rate_limiter = TokenBucket(1200, capacity=1)
+    start = time.perf_counter()
+    for _ in range(5):
+      client.get('/stock/market-holiday', {'exchange': 'US'})
+    elapsed = time.perf_counter() - start
+    check(f'token bucket spaced 5 requests over {elapsed * 1000:.0f}ms', elapsed >= 0.18)
+  finally:
+    server.shutdown()
+    db.session.rollback()
+    CachedResponse.query.filter_by(key=cache_key).delete()
+    db.session.commit()
+
+  if failures:
+    raise click.ClickException(f"{len(failures)} Finnhub client checks failed")
+  click.echo("Finnhub client OK")
+
+
+def _replay_download(recorded, calls):
+  # Stand-in for yf.download answering from a recorded multi-ticker frame, cut to the requested symbols and window
+  import pandas as pd
+  import yfinance as yf
+
+  columns = pd.MultiIndex.from_tuples([tuple(column) for column in recorded['columns']], names=['Price', 'Ticker'])
+  frame = pd.DataFrame(recorded['data'], index=pd.to_datetime(recorded['index']), columns=columns, dtype=float)
+
+  def download(tickers, start, end, **kwargs):
+    calls.append(list(tickers))
+    # Like yfinance, the errors of the last download are left in a module global
+    yf.shared._ERRORS = {ticker: error for ticker, error in recorded['errors'].items() if ticker in tickers}
+    rows = frame[(frame.index >= start) & (frame.index < end)]
+    return rows.loc[:, rows.columns.get_level_values('Ticker').isin(tickers)]
+
+  return download
+
+
+@click.command('check-daily-bars')
+@click.option('--fixture', default=None, help='Recorded yf.download frame, defaults to app/fixtures/yfinance_download.json')
+def check_daily_bars(fixture):
+  """Replay a recorded multi-ticker yf.download frame through get_daily_bars and the price store
+
+  The frame has a day without a bar for one symbol, a symbol Yahoo has no
+  bars for and one whose download timed out. Bars and coverage are written
+  inside a transaction that is rolled back.
+  """
+  from unittest import mock
+  import yfinance as yf
+  from app.news_requester import get_daily_bars
+  from app.storage.db_models import DailyBar, PriceCoverage
+  from app.storage.price_store import PriceStore
+
+  with open(fixture or os.path.join(current_app.root_path, 'fixtures', 'yfinance_download.json')) as f:
+    recorded = json.load(f)
+  calls = []
+  failures = []
+
+  def check(name, ok):
+    click.echo(f"{'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+      failures.append(name)
+
+  symbols = ['AAPL', 'MSFT', 'DELISTED', 'FLAKY']
+  start, end, saturday = date(2024, 10, 14), date(2024, 10, 18), date(2024, 10, 19)
+  with mock.patch.object(yf, 'download', _replay_download(recorded, calls)), \
+       mock.patch.object(yf.shared, '_ERRORS', {}), _rolled_back_session():
+    bars = get_daily_bars([symbol.lower() for symbol in symbols], start, end)
+    check('bars for every recorded day', len(bars.get('AAPL', {})) == 5
+          and bars['AAPL'][end] == (236.18, 236.18, 234.01, 235.0, 46431500))
+    check('day without a bar skipped', len(bars.get('MSFT', {})) == 4 and date(2024, 10, 16) not in bars['MSFT'])
+    check('symbol without bars maps to no bars', bars.get('DELISTED') == {})
+    check('failed download left out', 'FLAKY' not in bars)
+
+    # Start from an empty store, whatever the database already holds for these symbols
+    DailyBar.query.filter(DailyBar.symbol.in_(symbols)).delete()
+    PriceCoverage.query.filter(PriceCoverage.symbol.in_(symbols)).delete()
+    store = PriceStore()
+    pairs = [(symbol, day) for symbol in symbols for day in (start, end, saturday)]
+    calls.clear()
+    prices = store.get_closing_prices(pairs)
+    check('closing prices from the frame', prices.get(('AAPL', end)) == 235.0 and prices.get(('MSFT', start)) == 419.14)
+    check('no prices for the weekend or symbols without bars',
+          not any(day == saturday or symbol in ('DELISTED', 'FLAKY') for symbol, day in prices))
+    check('one download for the shared window', len(calls) == 1)
+    check('coverage over the window, with or without bars',
+          all(store._coverage.get(symbol) == (start, saturday) for symbol in ('AAPL', 'MSFT', 'DELISTED')))
+    check('no coverage after a failed download', store._coverage.get('FLAKY') is None)
+
+    calls.clear()
+    store.get_closing_prices(pairs)
+    check('only the failed symbol downloaded again', calls == [['FLAKY']])
+
+  if failures:
+    raise click.ClickException(f"{len(failures)} daily bar checks failed")
+  click.echo("Daily bars OK")
+
+
+def register_commands(app):
+  app.cli.add_command(benchmark_classification)
+  app.cli.add_command(benchmark_finbert)
+  app.cli.add_command(benchmark_predictions)
+  app.cli.add_command(check_date_lookups)
+  app.cli.add_command(loadtest_sse)
+  app.cli.add_command(rebuild_outcomes_command)
+  app.cli.add_command(backtest_command)
+  app.cli.add_command(init_db_command)
+  app.cli.add_command(check_import_time)
+  app.cli.add_command(check_finnhub_client)
+  app.cli.add_command(check_daily_bars)
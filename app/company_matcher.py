@@ -0,0 +1,129 @@
+import re
+from collections import defaultdict, deque
+
+# Legal suffixes and share classes that news rarely repeats after the company name
+_SUFFIX_PATTERN = re.compile(
+    r'(?:[\s,]+(?:inc|incorporated|corp|corporation|co|company|ltd|limited|llc|plc|sa|ag|nv|se|holdings?|group'
+    r'|class [a-z]|adr)\.?|\.com)$'
+)
+_SPACE_PATTERN = re.compile(r'\s+')
+MIN_ALIAS_LENGTH = 3  # Shorter aliases match inside too many unrelated words
+MIN_SHORT_NAME_LENGTH = 4
+
+# First words that don't identify a company on their own
+GENERIC_WORDS = {
+    'the', 'american', 'general', 'first', 'united', 'new', 'international', 'global', 'national', 'bank',
+    'capital', 'energy', 'financial', 'royal', 'southern', 'western', 'eastern', 'northern', 'digital', 'advanced'
+}
+
+# Names news uses that can't be derived from the registered company name
+BRAND_ALIASES = {
+    'GOOG': ('google',),
+    'GOOGL': ('google',),
+    'META': ('facebook',),
+    'DIS': ('disney',),
+}
+
+
+def aliases(name):
+    """Lowercased name of a company with and without its legal suffixes, e.g. 'apple inc' and 'apple'"""
+    name = _SPACE_PATTERN.sub(' ', name.lower()).strip()
+    result = {name}
+    while True:
+        shorter = _SUFFIX_PATTERN.sub('', name).strip()
+        if shorter == name:
+            break
+        name = shorter
+        result.add(name)
+    return {alias for alias in result if len(alias) >= MIN_ALIAS_LENGTH}
+
+
+def short_name(name):
+    """First word of a multi-word company name, e.g. 'meta' for 'Meta Platforms Inc', or None"""
+    base = min(aliases(name), key=len, default='')
+    if base.startswith('the '):
+        base = base[4:]
+    words = base.split(' ')
+    if len(words) < 2 or len(words[0]) < MIN_SHORT_NAME_LENGTH or words[0] in GENERIC_WORDS:
+        return None
+    return words[0]
+
+
+class AhoCorasick:
+    """Finds every occurrence of many patterns in one pass over the text
+
+    Matches are only reported on word boundaries, so 'meta' doesn't match
+    inside 'metal'.
+    """
+
+    def __init__(self, patterns):
+        # patterns: {pattern: value}; one node per prefix, node 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # node -> [(pattern length, value)] ending at it, including via fail links
+
+        for pattern, value in patterns.items():
+            node = 0
+            for char in pattern:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].append((len(pattern), value))
+
+        # Breadth first, so the fail link of a node is final before its children need it
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text):
+        """Values of every pattern occurring in `text` as whole words"""
+        found = set()
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._output[node]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    found.add(value)
+        return found
+
+
+class CompanyMatcher:
+    """Maps company names mentioned in a text to their symbols"""
+
+    def __init__(self, names):
+        # names: {symbol: company name}; an alias can belong to several symbols, e.g. GOOG and GOOGL
+        patterns = defaultdict(set)
+        for symbol, name in names.items():
+            for alias in aliases(name or ''):
+                patterns[alias].add(symbol)
+            for alias in BRAND_ALIASES.get(symbol, ()):
+                patterns[alias].add(symbol)
+
+        # Short names are only used when every company sharing one has the same base name
+        short_names = defaultdict(set)
+        for symbol, name in names.items():
+            short = short_name(name or '')
+            if short:
+                short_names[short].add(symbol)
+        for short, symbols in short_names.items():
+            if len({min(aliases(names[symbol]), key=len) for symbol in symbols}) == 1:
+                patterns[short] |= symbols
+
+        self.size = len(names)
+        self._automaton = AhoCorasick({alias: frozenset(symbols) for alias, symbols in patterns.items()})
+
+    def find(self, text):
+        return set().union(*self._automaton.find(text.lower()))
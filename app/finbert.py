@@ -0,0 +1,99 @@
+import os
+import threading
+
+from config import Config
+
+# Set environment variable to avoid tokenizer warnings
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+QUANTIZE_OPTIONS = ("none", "int8", "onnx")
+
+
+class FinbertClassifier:
+  """Local FinBERT sentiment classifier running on the CPU.
+
+  The tokenizer and model are loaded once and reused. Texts are tokenized in
+  padded batches and run under torch.inference_mode with a fixed number of
+  intra-op threads. `quantize` selects the plain model ("none"), dynamic int8
+  quantization of the linear layers ("int8") or an ONNX Runtime export
+  ("onnx", needs optimum[onnxruntime]).
+  """
+
+  def __init__(self, model_name="ProsusAI/finbert", threads=4, batch_size=32, quantize="none", max_length=128):
+    if quantize not in QUANTIZE_OPTIONS:
+      raise ValueError(f"quantize must be one of {QUANTIZE_OPTIONS}, got {quantize!r}")
+    self.model_name = model_name
+    self.threads = threads
+    self.batch_size = max(1, batch_size)
+    self.quantize = quantize
+    self.max_length = max_length
+    self._tokenizer = None
+    self._model = None
+    self._labels = None
+    self._load_lock = threading.Lock()
+    self._inference_lock = threading.Lock()  # One batch at a time, the threads are used inside each batch
+
+  def load(self):
+    """Load the tokenizer and model if that hasn't happened yet"""
+    if self._model is not None:
+      return
+    with self._load_lock:
+      if self._model is not None:
+        return
+
+      import torch
+      from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+      torch.set_num_threads(self.threads)
+      tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+
+      if self.quantize == "onnx":
+        try:
+          from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+          raise RuntimeError("FINBERT_QUANTIZE=onnx requires optimum[onnxruntime]") from e
+        model = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+      else:
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        if self.quantize == "int8":
+          model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+      # Map the model's output order (positive, negative, neutral for ProsusAI/finbert) to our labels
+      self._labels = [model.config.id2label[i].capitalize() for i in range(len(model.config.id2label))]
+      self._tokenizer = tokenizer
+      self._model = model
+      print(f"Loaded {self.model_name} (quantize={self.quantize}, threads={self.threads})")
+
+  def classify(self, texts):
+    """Classify a list of texts, returning one classification result per text"""
+    import torch
+
+    self.load()
+    results = []
+    with self._inference_lock, torch.inference_mode():
+      for start in range(0, len(texts), self.batch_size):
+        inputs = self._tokenizer(
+          list(texts[start:start + self.batch_size]),
+          padding=True,  # Pad to the longest text of the batch only
+          truncation=True,
+          max_length=self.max_length,
+          return_tensors="pt"
+        )
+        probs = torch.softmax(self._model(**inputs).logits, dim=1).tolist()
+
+        for row in probs:
+          probabilities = dict(zip(self._labels, row))
+          results.append({
+              "sentiment": max(probabilities, key=probabilities.get),
+              "probabilities": {label: probabilities.get(label, 0.0) for label in ("Positive", "Negative", "Neutral")}
+          })
+    return results
+
+
+finbert = FinbertClassifier(
+  model_name=Config.FINBERT_MODEL,
+  threads=Config.FINBERT_THREADS,
+  batch_size=Config.FINBERT_BATCH_SIZE,
+  quantize=Config.FINBERT_QUANTIZE
+)
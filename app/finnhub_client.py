@@ -0,0 +1,142 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.metrics import timed
+from app.storage.response_cache import response_cache, response_key
+from config import Config
+
+
+class TokenBucket:
+    """Token bucket rate limiter, acquire() blocks until a token is available"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0  # Tokens per second
+        self.capacity = capacity or rate_per_minute
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FinnhubClient:
+    """Shared Finnhub HTTP client.
+
+    Uses one pooled keep-alive session, applies connect/read timeouts, stays
+    under the API rate limit with a token bucket, retries 429 and 5xx
+    responses with exponential backoff, and records latency per endpoint.
+    The base URL is configurable so it can be pointed at a local stub server.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url, api_key, rate_per_minute=60, timeout=(3.05, 10), max_retries=3,
+                 backoff=0.5, pool_size=10):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = TokenBucket(rate_per_minute)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._stats = {}  # endpoint -> {'count', 'errors', 'retries', 'total_seconds', 'max_seconds'}
+        self._stats_lock = threading.Lock()
+
+    def _record(self, endpoint, seconds=None, error=False, retry=False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {
+                'count': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            if seconds is not None:
+                stats['count'] += 1
+                stats['total_seconds'] += seconds
+                stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if error:
+                stats['errors'] += 1
+            if retry:
+                stats['retries'] += 1
+
+    def get(self, endpoint, params=None, ttl=None):
+        """GET a Finnhub endpoint (e.g. '/quote') and return the decoded JSON body
+
+        With a ttl (timedelta, or response_cache.FOREVER) the response is read
+        through the shared response cache.
+        """
+        if ttl is None:
+            with timed('finnhub', endpoint):
+                return self._request(endpoint, params)
+
+        key = response_key(endpoint, params)
+        body = response_cache.get(key)
+        if body is None:
+            with timed('finnhub', endpoint):
+                body = self._request(endpoint, params)
+            response_cache.set(key, endpoint, body, ttl)
+        return body
+
+    def _request(self, endpoint, params=None):
+        params = {**(params or {}), 'token': self.api_key}
+        url = f"{self.base_url}{endpoint}"
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                if attempt == self.max_retries:
+                    raise
+                self._record(endpoint, retry=True)
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            self._record(endpoint, time.perf_counter() - start, error=response.status_code >= 400)
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                self._record(endpoint, retry=True)
+                # Honour Retry-After on 429s if Finnhub sends it
+                retry_after = response.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    def stats(self):
+        """Per endpoint request counts and latencies"""
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    **stats,
+                    'avg_seconds': round(stats['total_seconds'] / stats['count'], 4) if stats['count'] else None
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+
+finnhub = FinnhubClient(
+    base_url=Config.FINNHUB_BASE_URL,
+    api_key=Config.FINNHUB_API_KEY,
+    rate_per_minute=Config.FINNHUB_RATE_LIMIT,
+    timeout=(Config.FINNHUB_CONNECT_TIMEOUT, Config.FINNHUB_READ_TIMEOUT),
+    max_retries=Config.FINNHUB_MAX_RETRIES
+)
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app import db
+from app import metrics
+from app.storage.db_models import Job
+
+
+class JobHandle:
+    """In-memory side of a job: the events it published and a condition to wait on them"""
+
+    def __init__(self, job_id, kind, key):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.events = []
+        self.done = False
+        self.finished_at = None
+        self.profile = False  # Set when the submitting request asked for a profile
+        self._condition = threading.Condition()
+
+    def publish(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def finish(self):
+        with self._condition:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._condition.notify_all()
+
+    def wait(self, index, timeout=None):
+        """Block until there are more than `index` events or the job is done"""
+        with self._condition:
+            if len(self.events) <= index and not self.done:
+                self._condition.wait(timeout)
+            return self.events[index:], self.done
+
+
+class JobScheduler:
+    """In-process job scheduler with a worker pool.
+
+    Jobs are generator functions that yield progress events (dicts); the last
+    event is the job's result. Jobs with the same key are deduplicated while
+    one is queued or running, failures are retried with exponential backoff,
+    and status is persisted in the jobs table.
+    """
+
+    def __init__(self, max_workers=4, max_attempts=3, retry_delay=2.0, retention_seconds=3600):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention_seconds = retention_seconds
+        self._app = None
+        self._executor = None
+        self._handles = {}  # job id -> JobHandle
+        self._active = {}  # key -> JobHandle of the queued or running job
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self.max_workers = app.config.get('JOB_MAX_WORKERS', self.max_workers)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+
+    def submit(self, kind, key, func, *args):
+        """Queue func(*args), or return the queued or running job with the same key"""
+        with self._lock:
+            self._prune()
+            handle = self._active.get(key)
+            if handle is not None:
+                return handle
+
+            handle = JobHandle(str(uuid.uuid4()), kind, key)
+            handle.profile = metrics.profiling_requested()
+            self._handles[handle.id] = handle
+            self._active[key] = handle
+
+        # Batch keys can be long, the full key is only needed in memory for deduplication
+        db.session.add(Job(id=handle.id, kind=kind, key=key[:200], status='queued'))
+        db.session.commit()
+
+        self._executor.submit(self._run, handle, func, args)
+        return handle
+
+    def get(self, job_id):
+        return self._handles.get(job_id)
+
+    def stream(self, handle, timeout=15):
+        """Yield every event of a job as it is published, from the start, until the job is done
+
+        Yields None when no event arrived within `timeout` seconds so callers can
+        send keep-alives.
+        """
+        index = 0
+        while True:
+            events, done = handle.wait(index, timeout)
+            for event in events:
+                yield event
+            index += len(events)
+            if done and not events:
+                return
+            if not events:
+                yield None
+
+    def _run(self, handle, func, args):
+        with self._app.app_context():
+            metrics.current_work()  # Start timing the job
+            profiler = metrics.start_profiler() if handle.profile else None
+            status = 'failed'
+            sent = 0  # Events of the furthest attempt so far, a retry doesn't publish its progress again
+            try:
+                for attempt in range(1, self.max_attempts + 1):
+                    self._update(handle.id, status='running', attempts=attempt)
+                    index = 0
+                    try:
+                        last_event = None
+                        last_saved = 0.0
+                        for event in func(*args):
+                            index += 1
+                            last_event = event
+                            # A retry starts over, clients would see progress counts go backwards
+                            if index <= sent and event.get('status') == 'progress':
+                                continue
+                            handle.publish(event)
+                            # Persist progress at most once a second
+                            if time.monotonic() - last_saved > 1:
+                                self._update(handle.id, progress=event)
+                                last_saved = time.monotonic()
+
+                        self._update(handle.id, status='succeeded', progress=last_event, result=last_event)
+                        status = 'succeeded'
+                        return
+
+                    except Exception as e:
+                        db.session.rollback()
+                        sent = max(sent, index)
+                        print(f"Job {handle.id} ({handle.key}) failed on attempt {attempt}: {e}")
+                        traceback.print_exc()
+                        if attempt == self.max_attempts:
+                            event = {'status': 'error', 'message': f'{handle.kind} failed: {e}'}
+                            handle.publish(event)
+                            self._update(handle.id, status='failed', result=event, error=str(e))
+                            return
+
+                        delay = self.retry_delay * 2 ** (attempt - 1)
+                        handle.publish({'status': 'retrying', 'attempt': attempt, 'message': f'Retrying in {delay:.0f}s'})
+                        time.sleep(delay)
+            finally:
+                with self._lock:
+                    if self._active.get(handle.key) is handle:
+                        del self._active[handle.key]
+                handle.finish()
+                metrics.record_job(handle.kind, status)
+                if profiler is not None:
+                    metrics.stop_profiler(self._app, profiler, f"job-{handle.kind}-{handle.id}")
+                db.session.remove()
+
+    def reconcile(self, job):
+        """Fail a job that is queued or running in the database but unknown to this process
+
+        Such a job was lost when the server restarted and nothing will ever finish it.
+        """
+        if job.status in ('queued', 'running') and job.id not in self._handles:
+            event = {'status': 'error', 'message': f'{job.kind} was interrupted by a server restart'}
+            self._update(job.id, status='failed', result=event, error='Interrupted by a server restart')
+
+    def _update(self, job_id, **values):
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return
+        for name, value in values.items():
+            setattr(job, name, value)
+        job.updated_at = datetime.now()
+        db.session.commit()
+
+    def _prune(self):
+        # Forget finished jobs after the retention period, their status stays in the database
+        now = time.monotonic()
+        for job_id, handle in list(self._handles.items()):
+            if handle.done and now - handle.finished_at > self.retention_seconds:
+                del self._handles[job_id]
+
+
+def format_sse(event, job_id):
+    """Format a job event as a server-sent event message, None becomes a keep-alive comment"""
+    if event is None:
+        # Keep-alive comment so proxies don't close an idle stream
+        return ": keep-alive\n\n"
+    return f"data: {json.dumps({**event, 'job_id': job_id})}\n\n"
+
+
+scheduler = JobScheduler()
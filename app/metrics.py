@@ -0,0 +1,289 @@
+import cProfile
+import os
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """Prometheus style cumulative histogram with one series per label combination"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = list(zip(self.label_names, key))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms plus collectors that report gauges (e.g. cache counters) when scraped"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._collectors = []  # callables returning [(name, type, help, [(labels, value)])]
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, label_names=(), buckets=DURATION_BUCKETS):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name, help_text, label_names, buckets)
+            return self.histograms[name]
+
+    def register_collector(self, collector):
+        # Registering the same collector again (e.g. another create_app) would duplicate its samples
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for histogram in list(self.histograms.values()):
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    'stage_duration_seconds', 'Duration of external calls and storage operations', ('stage', 'operation'))
+query_duration = registry.histogram(
+    'db_query_duration_seconds', 'Duration of SQL statements', ('statement',))
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Duration of HTTP requests handled by Flask', ('endpoint', 'method', 'status'))
+request_queries = registry.histogram(
+    'db_queries_per_request', 'SQL statements executed per HTTP request', ('endpoint',), COUNT_BUCKETS)
+job_duration = registry.histogram(
+    'job_duration_seconds', 'Duration of background jobs', ('kind', 'status'))
+job_queries = registry.histogram(
+    'db_queries_per_job', 'SQL statements executed per background job', ('kind',), COUNT_BUCKETS)
+job_stage_duration = registry.histogram(
+    'job_stage_seconds', 'Time a background job spent in each stage', ('kind', 'stage'))
+
+_work_lock = threading.Lock()
+
+
+def current_work():
+    """Stage totals and query count of the current unit of work (request, job or CLI command), or None
+
+    Lives on flask.g, so it belongs to the active app context. Worker threads
+    without an app context can be handed the dict explicitly.
+    """
+    if not has_app_context():
+        return None
+    work = g.get('_metrics_work')
+    if work is None:
+        work = g._metrics_work = {'started': time.perf_counter(), 'queries': 0, 'stages': {}}
+    return work
+
+
+def _add_to_work(work, stage, seconds):
+    if work is not None:
+        with _work_lock:
+            work['stages'][stage] = work['stages'].get(stage, 0.0) + seconds
+
+
+class timed:
+    """Time a block or function as `stage`, usable as a context manager or a decorator
+
+    Observes stage_duration_seconds and adds the time to the current unit of
+    work. Pass `work` (from current_work()) when timing on a worker thread.
+    """
+
+    def __init__(self, stage, operation='', work=None):
+        self.stage = stage
+        self.operation = operation
+        self.work = work
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        stage_duration.observe(seconds, stage=self.stage, operation=self.operation)
+        _add_to_work(self.work if self.work is not None else current_work(), self.stage, seconds)
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage, self.operation or func.__name__, self.work):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_metrics_query_start')
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    query_duration.observe(seconds, statement=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else '')
+    work = current_work()
+    if work is not None:
+        with _work_lock:
+            work['queries'] += 1
+        _add_to_work(work, 'postgres', seconds)
+
+
+def _profile_path(app, name):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_name}.prof")
+
+
+def profiling_requested():
+    """Whether the current request opted into profiling with ?profile=1 (and profiling is enabled)"""
+    return has_request_context() and g.get('_profiler') is not None
+
+
+def start_profiler():
+    # Returns None if another profiler is already active in this interpreter
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def stop_profiler(app, profiler, name):
+    """Stop a profiler and dump its stats for snakeviz/pstats, returning the file path"""
+    profiler.disable()
+    path = _profile_path(app, name)
+    profiler.dump_stats(path)
+    print(f"Profile written to {path}")
+    return path
+
+
+def record_job(kind, status):
+    """Observe the duration, query count and stage totals of the job running in the current app context"""
+    work = current_work()
+    job_duration.observe(time.perf_counter() - work['started'], kind=kind, status=status)
+    job_queries.observe(work['queries'], kind=kind)
+    for stage, seconds in work['stages'].items():
+        job_stage_duration.observe(seconds, kind=kind, stage=stage)
+
+
+def _cache_collector():
+    from app.finnhub_client import finnhub
+    from app.storage.classification_cache import classification_cache
+    from app.storage.response_cache import response_cache
+
+    classification = classification_cache.stats()
+    responses = response_cache.stats()
+    caches = [
+        ('classification_memory', classification['memory_hits'], None),
+        ('classification_db', classification['db_hits'], None),
+        ('classification', classification['memory_hits'] + classification['db_hits'], classification['misses']),
+        ('finnhub_response', responses['hits'], responses['misses']),
+    ]
+    return [
+        ('cache_hits_total', 'counter', 'Cache lookups answered from the cache',
+         [([('cache', name)], hits) for name, hits, _ in caches]),
+        ('cache_misses_total', 'counter', 'Cache lookups that missed',
+         [([('cache', name)], misses) for name, _, misses in caches]),
+        ('cache_hit_ratio', 'gauge', 'Share of lookups answered from the cache',
+         [([('cache', 'classification')], classification['hit_ratio']),
+          ([('cache', 'finnhub_response')], responses['hit_ratio'])]),
+        ('finnhub_requests_total', 'counter', 'Finnhub HTTP requests, including retries',
+         [([('endpoint', endpoint)], stats['count']) for endpoint, stats in finnhub.stats().items()]),
+        ('finnhub_errors_total', 'counter', 'Finnhub requests that failed or returned an error status',
+         [([('endpoint', endpoint)], stats['errors']) for endpoint, stats in finnhub.stats().items()]),
+    ]
+
+
+def _single_flight_collector():
+    from app.news_requester import quote_flights
+    from app.storage.price_store import closing_price_flights
+
+    flights = [('quote', quote_flights.stats()), ('closing_price', closing_price_flights.stats())]
+    return [
+        ('single_flight_calls_total', 'counter', 'Lookups that were executed',
+         [([('flight', name)], stats['calls']) for name, stats in flights]),
+        ('single_flight_coalesced_total', 'counter', 'Lookups that joined an identical call in flight',
+         [([('flight', name)], stats['coalesced']) for name, stats in flights]),
+    ]
+
+
+def init_app(app):
+    """Time every request, count its SQL statements and optionally profile it with ?profile=1"""
+    # The listeners are global to every Engine, only add them the first time an app is created
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    registry.register_collector(_cache_collector)
+    registry.register_collector(_single_flight_collector)
+
+    @app.before_request
+    def start_request_metrics():
+        current_work()
+        if app.config['PROFILING_ENABLED'] and request.args.get('profile') == '1':
+            g._profiler = start_profiler()
+
+    @app.after_request
+    def record_request_metrics(response):
+        work = current_work()
+        endpoint = request.endpoint or 'unknown'
+        request_duration.observe(time.perf_counter() - work['started'], endpoint=endpoint,
+                                 method=request.method, status=response.status_code)
+        request_queries.observe(work['queries'], endpoint=endpoint)
+
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            response.headers['X-Profile-File'] = stop_profiler(app, profiler, endpoint)
+        return response
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
 import requests
 import os
+import threading
 from dotenv import load_dotenv
-import yfinance as yf
+
+from app.finnhub_client import finnhub
+from app.metrics import timed
+from app.single_flight import SingleFlight
+from app.storage.response_cache import FOREVER
+from config import Config
 
 load_dotenv()
-api_key = os.getenv("FINNHUB_API_KEY")
 
 def get_news_NEWSAPI():
   api_key = os.getenv("NEWS_API_KEY")
@@ -32,7 +37,6 @@ def get_news_NEWSAPI():
   return articles
 
 def get_news_FINNHUB(symbol: str, date: str):
-    url = f"https://finnhub.io/api/v1/company-news"
     provided_date = datetime.strptime(date, "%Y-%m-%d")
     two_days_ago = (provided_date - timedelta(days=2)).strftime("%Y-%m-%d")
     
@@ -45,60 +49,80 @@ def get_news_FINNHUB(symbol: str, date: str):
         "symbol": symbol.upper(),        # stock symbol
         "from": two_days_ago,            # start date (YYYY-MM-DD)
         "to": date,                   # end date
-        "token": api_key
     }
-    response = requests.get(url, params=params)
-    return response.json()
+    # News windows that ended before today can't change anymore
+    if provided_date.date() < datetime.now().date():
+        ttl = FOREVER
+    else:
+        ttl = timedelta(minutes=Config.NEWS_CACHE_TTL_MINUTES)
+    return finnhub.get("/company-news", params, ttl=ttl)
+
+quote_flights = SingleFlight()
 
 def get_price_now(symbol):
-    url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={api_key}"
-    response = requests.get(url)
-    data = response.json()
+    # Concurrent lookups of the same symbol share one request
+    data = quote_flights.do(symbol.upper(), finnhub.get, "/quote", {"symbol": symbol})
     return data.get("c")  # 'c' is the current price in Finnhub's API
 
 def get_company_name_by_symbol(symbol):
-    url = f"https://finnhub.io/api/v1/stock/profile2?symbol={symbol}&token={api_key}"
-    response = requests.get(url)
-    data = response.json()
+    data = finnhub.get("/stock/profile2", {"symbol": symbol}, ttl=timedelta(days=Config.PROFILE_CACHE_TTL_DAYS))
     return data.get("name") 
 
-def get_closing_price_at_date(symbol: str, date_str: str):
-    date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    next_day = date + timedelta(days=1)
-
-    data = yf.download(symbol, start=date_str, end=next_day.strftime("%Y-%m-%d"), progress=False, auto_adjust=True)
-  
+# yfinance keeps the frames and errors of a download in module globals, so downloads can't overlap
+yfinance_lock = threading.Lock()
+# Errors yfinance reports for a symbol that simply has no bars in the range (weekends, holidays, unknown symbols)
+NO_DATA_ERRORS = ('possibly delisted', 'YFPricesMissingError', 'YFTzMissingError')
+
+def get_daily_bars(symbols, start, end):
+    """Download daily OHLCV bars for many symbols between two dates (inclusive) in one request
+
+    Returns a dict of symbol -> {date: (open, high, low, close, volume)}.
+    Symbols whose download failed are left out, so callers can tell them
+    apart from symbols that had no bars in the range (an empty dict).
+    """
+    import yfinance as yf  # Pulls in pandas, only load it when bars are actually downloaded
+
+    symbols = sorted({symbol.upper() for symbol in symbols})
+
+    with yfinance_lock, timed('yfinance', 'download'):
+        data = yf.download(
+            symbols,
+            start=start.strftime("%Y-%m-%d"),
+            end=(end + timedelta(days=1)).strftime("%Y-%m-%d"),
+            progress=False,
+            auto_adjust=True
+        )
+        # yf.download doesn't raise for failed symbols, it records them here
+        errors = dict(yf.shared._ERRORS)
+
+    failed = {symbol for symbol, error in errors.items() if not any(marker in str(error) for marker in NO_DATA_ERRORS)}
+    for symbol in sorted(failed):
+        print(f"Could not download bars for {symbol}: {errors[symbol]}")
+    bars = {symbol: {} for symbol in symbols if symbol not in failed}
     if data.empty:
-        return None
-
-    closing_price = float(round(data.loc[str(date)]['Close'][symbol],2))
-
-    # If there's only one row, pandas may return a scalar, otherwise a Series
-    if isinstance(closing_price, float):
-        return closing_price
-    else:
-        return closing_price.iloc[0]
-
-def check_market_holiday(date):
-    """Check if a given date is a market holiday using Finnhub API"""
-    url = f"https://finnhub.io/api/v1/stock/market-holiday?exchange=US&token={api_key}"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        data = response.json()
-        
-        # Convert date to string format YYYY-MM-DD for comparison
-        date_str = date.strftime('%Y-%m-%d')
-        
-        # Check if the date is in the holiday list
-        # Only consider it a holiday if tradingHour is empty (full day holiday)
-        for holiday in data.get('data', []):
-            if holiday.get('atDate') == date_str and holiday.get('tradingHour') == '':
-                return True
-        
-        return False
-        
-    except Exception as e:
-        print(f"Error checking market holiday: {e}")
-        return False  # Default to not a holiday in case of error
\ No newline at end of file
+        return bars
+
+    for timestamp, row in data.iterrows():
+        date = timestamp.date()
+        for symbol in bars:
+            close = row.get(('Close', symbol))
+            if close is None or close != close:  # Skip NaN for symbols without a row that day
+                continue
+            values = [row.get((column, symbol)) for column in ('Open', 'High', 'Low')]
+            volume = row.get(('Volume', symbol))
+            bars[symbol][date] = (
+                *[float(round(value, 2)) if value == value else None for value in values],
+                float(round(close, 2)),
+                int(volume) if volume == volume and volume is not None else None
+            )
+
+    return bars
+
+
+def get_market_holidays(exchange="US"):
+    """Fetch the market holiday list of an exchange from the Finnhub API
+
+    Returns the raw list of holiday entries, each with 'atDate' (YYYY-MM-DD)
+    and 'tradingHour' (empty for full day closures).
+    """
+    return finnhub.get("/stock/market-holiday", {"exchange": exchange}, ttl=timedelta(days=1)).get('data', [])
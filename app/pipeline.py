@@ -0,0 +1,459 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+from flask import current_app
+
+from app.news_requester import get_price_now, get_news_FINNHUB
+from app.storage.price_store import get_closing_price_at_date, get_closing_prices
+from app.storage.company_registry import company_registry
+from app.storage.rolling_sentiment import get_article_classifications, ingest
+from app.storage.storage import (
+    prediction_for_company_and_date_exists,
+    predictions_since_query,
+    save_prediction, 
+    save_predictions,
+    save_closing_price,
+    save_closing_prices,
+    update_last_price_timestamp,
+    get_classified_news_by_urls
+)
+from app.utils import save_future_closing_prices
+from app.trading_calendar import is_market_holiday
+from app.ai import classify_concurrently, filter_relevant
+from app.classifiers import router
+from app.jobs import scheduler
+from app.storage.db_models import ClosingPrice
+
+
+def _classification_from_news(existing_news):
+    # Rebuild a classification result from a stored ClassifiedNews row
+    return {
+        'sentiment': existing_news.classification,
+        'probabilities': {
+            # Set other probabilities to 0 since we don't store them
+            'Positive': existing_news.confidence_score if existing_news.classification == 'Positive' else 0,
+            'Negative': existing_news.confidence_score if existing_news.classification == 'Negative' else 0,
+            'Neutral': existing_news.confidence_score if existing_news.classification == 'Neutral' else 0
+        },
+        'backend': existing_news.backend
+    }
+
+
+def _reusable(existing_news):
+    # Labels from a fallback backend (e.g. the lexicon during an outage) are classified again
+    return existing_news.backend is None or existing_news.backend == router.primary.name
+
+
+def _summarize(classifications):
+    # Sentiment counts and probability sums, in list order so the sums are deterministic
+    return {
+        'positive_count': sum(1 for c in classifications if c['sentiment'] == "Positive"),
+        'negative_count': sum(1 for c in classifications if c['sentiment'] == "Negative"),
+        'neutral_count': sum(1 for c in classifications if c['sentiment'] == "Neutral"),
+        'positive_probability': sum(c['probabilities']['Positive'] for c in classifications),
+        'negative_probability': sum(c['probabilities']['Negative'] for c in classifications),
+        'neutral_probability': sum(c['probabilities']['Neutral'] for c in classifications)
+    }
+
+
+def _prediction_date_time(date_str):
+    # Predictions for today are stamped with the current time, past ones with the end of the day
+    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    if date_str == datetime.now().strftime('%Y-%m-%d'):
+        return datetime.combine(date, datetime.now(ZoneInfo("Europe/Berlin")).time())
+    return datetime.combine(date, dt_time(hour=23, minute=59, second=59))
+
+
+def run_prediction(symbol, date_str):
+    """Fetch, classify and save a prediction, yielding progress events
+
+    Runs as a background job; the last event is either the 'complete' summary
+    or an 'error'.
+    """
+    #check if prediction for date and company already exists
+    if prediction_for_company_and_date_exists(symbol, date_str):
+        print(f"Prediction for {symbol} on {date_str} already exists")
+        yield {'status': 'error', 'message': f'Prediction for {symbol} on {date_str} already exists'}
+        return
+
+    # A prediction for an unknown company can't be saved, find out before paying for news and classification
+    if symbol.upper() not in company_registry.ensure([symbol]):
+        yield {'status': 'error', 'message': f'Unknown company {symbol}, no prediction made'}
+        return
+
+    news = get_news_FINNHUB(symbol, date_str)
+    fetched_count = len(news)
+
+    # Loosely related articles are dropped before they cost a classification
+    news = filter_relevant(symbol, news, current_app.config['RELEVANCE_MIN_SCORE'])
+    total_news_count = len(news)
+    avoided_count = fetched_count - total_news_count
+    print(f"news for {symbol}: {total_news_count} ({avoided_count} not about {symbol} skipped)")
+
+    if total_news_count == 0:
+        message = f'No relevant news for {symbol}.' if fetched_count else f'No news for {symbol}.'
+        yield {'status': 'error', 'message': message}
+        return
+
+    # Store classifications for later use, in the same order as the news articles
+    classifications = [None] * total_news_count
+    unclassified = []
+
+    # Send initial total count
+    yield {'status': 'progress', 'total_news': total_news_count, 'classified_news': 0}
+
+    is_today = date_str == datetime.now().strftime('%Y-%m-%d')
+
+    # Articles already counted in the rolling sentiment of the symbol only cost the delta
+    counted_by_url = get_article_classifications(symbol, (article['url'] for article in news)) if is_today else {}
+
+    # Look up every other article that already exists and has been classified in one query
+    existing_by_url = get_classified_news_by_urls(article['url'] for article in news
+                                                  if article['url'] not in counted_by_url)
+
+    for i, article in enumerate(news):
+        existing_news = existing_by_url.get(article['url'])
+
+        if article['url'] in counted_by_url:
+            classifications[i] = counted_by_url[article['url']]
+        elif existing_news and _reusable(existing_news):
+            # Use existing classification
+            classifications[i] = _classification_from_news(existing_news)
+        else:
+            unclassified.append(i)
+
+    classified_count = total_news_count - len(unclassified)
+    print(f"Using {classified_count} existing classifications, classifying {len(unclassified)} new articles")
+    if classified_count:
+        yield {'status': 'progress', 'total_news': total_news_count, 'classified_news': classified_count}
+
+    # Classify new articles in parallel and report progress as each one finishes
+    texts = [news[i]['summary'] for i in unclassified]
+    max_workers = current_app.config['CLASSIFY_MAX_WORKERS']
+    batch_size = current_app.config['CLASSIFY_BATCH_SIZE']
+    for j, analysis in classify_concurrently(texts, max_workers=max_workers, batch_size=batch_size):
+        classifications[unclassified[j]] = analysis
+        classified_count += 1
+        print(f"New classification ({classified_count}/{total_news_count}): {analysis}")
+        yield {'status': 'progress', 'total_news': total_news_count, 'classified_news': classified_count}
+
+    if is_today:
+        ingest(symbol, news, classifications)
+
+    # Aggregate in article order so the sums don't depend on completion order
+    summary = _summarize(classifications)
+    positive_count, negative_count, neutral_count = summary['positive_count'], summary['negative_count'], summary['neutral_count']
+    positive_probability = summary['positive_probability']
+    negative_probability = summary['negative_probability']
+    neutral_probability = summary['neutral_probability']
+
+    print(f"Sentiment Summary for {symbol}:")
+    print(f"Positive: {positive_count} ({positive_probability})")
+    print(f"Negative: {negative_count} ({negative_probability})")
+    print(f"Neutral: {neutral_count} ({neutral_probability})")
+
+    if is_today:
+        stock_value = get_price_now(symbol)
+    else:
+        stock_value = get_closing_price_at_date(symbol, date_str)
+    date_time = _prediction_date_time(date_str)
+
+    base_date: datetime.date = datetime.strptime(date_str, "%Y-%m-%d").date()
+
+    # Save current stock price
+    save_closing_price(symbol, base_date, stock_value)
+
+    # Save future closing prices
+    save_future_closing_prices(symbol, base_date)
+
+    # Save prediction with news articles, a concurrent run may have saved it first
+    status = save_prediction(symbol, date_time, positive_count, negative_count, neutral_count, positive_probability,
+                             negative_probability, neutral_probability, stock_value, news_articles=news,
+                             classifications=classifications)
+    if status == 'exists':
+        yield {'status': 'error', 'message': f'Prediction for {symbol} on {date_str} already exists'}
+        return
+    if status == 'unknown':
+        yield {'status': 'error', 'message': f'Unknown company {symbol}, prediction not saved'}
+        return
+
+    final_result = {
+        "status": "complete",
+        "symbol": symbol,
+        "positive_count": positive_count,
+        "negative_count": negative_count,
+        "neutral_count": neutral_count,
+        "positive_probability": round(positive_probability, 2),
+        "negative_probability": round(negative_probability, 2),
+        "neutral_probability": round(neutral_probability, 2),
+        "classifications_avoided": avoided_count,
+        "message": f"Prediction and sentiment summary for {symbol} on {datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m.%Y')} saved successfully."
+    }
+
+    yield final_result
+
+
+
+def run_predictions(symbols, date_str):
+    """Make predictions for many symbols at once, yielding progress events per symbol
+
+    News is fetched concurrently, articles shared between symbols are
+    classified once, and every prediction is saved in a single transaction.
+    Runs as a background job; the last event is the 'complete' summary.
+    """
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    base_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+
+    known = company_registry.ensure(symbols)
+    pending = []
+    for symbol in symbols:
+        if symbol not in known:
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped',
+                   'message': f'Unknown company {symbol}, no prediction made'}
+        elif prediction_for_company_and_date_exists(symbol, date_str):
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped',
+                   'message': f'Prediction for {symbol} on {date_str} already exists'}
+        else:
+            pending.append(symbol)
+
+    # Fetch news for every symbol concurrently
+    max_workers = current_app.config['CLASSIFY_MAX_WORKERS']
+    news_by_symbol = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1))) as executor:
+        futures = {executor.submit(get_news_FINNHUB, symbol, date_str): symbol for symbol in pending}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                news_by_symbol[symbol] = future.result()
+            except Exception as e:
+                news_by_symbol[symbol] = []
+                print(f"Could not fetch news for {symbol}: {e}")
+
+    # Drop articles that aren't about their symbol before anything is classified
+    fetched_urls = {article['url'] for symbol in pending for article in news_by_symbol[symbol]}
+    fetched_counts = {symbol: len(news_by_symbol[symbol]) for symbol in pending}
+    min_score = current_app.config['RELEVANCE_MIN_SCORE']
+    for symbol in pending:
+        news_by_symbol[symbol] = filter_relevant(symbol, news_by_symbol[symbol], min_score)
+        yield {'status': 'progress', 'symbol': symbol, 'stage': 'news', 'total_news': len(news_by_symbol[symbol]),
+               'irrelevant_news': fetched_counts[symbol] - len(news_by_symbol[symbol])}
+    # An article dropped for one symbol is still classified if it is relevant to another
+    avoided_count = len(fetched_urls - {article['url'] for symbol in pending for article in news_by_symbol[symbol]})
+
+    for symbol in pending:
+        if not news_by_symbol[symbol]:
+            message = f'No relevant news for {symbol}.' if fetched_counts[symbol] else f'No news for {symbol}.'
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped', 'message': message}
+    pending = [symbol for symbol in pending if news_by_symbol[symbol]]
+
+    # Deduplicate articles across symbols by URL
+    articles_by_url = {}
+    symbols_by_url = {}
+    for symbol in pending:
+        for article in news_by_symbol[symbol]:
+            articles_by_url.setdefault(article['url'], article)
+            symbols_by_url.setdefault(article['url'], set()).add(symbol)
+
+    classification_by_url = {
+        url: _classification_from_news(existing_news)
+        for url, existing_news in get_classified_news_by_urls(articles_by_url.keys()).items()
+        if _reusable(existing_news)
+    }
+
+    total_by_symbol = {symbol: len(news_by_symbol[symbol]) for symbol in pending}
+    classified_by_symbol = {
+        symbol: sum(1 for article in news_by_symbol[symbol] if article['url'] in classification_by_url)
+        for symbol in pending
+    }
+    for symbol in pending:
+        yield {'status': 'progress', 'symbol': symbol, 'stage': 'classify',
+               'total_news': total_by_symbol[symbol], 'classified_news': classified_by_symbol[symbol]}
+
+    # Classify every unique new article once
+    unclassified = [url for url in articles_by_url if url not in classification_by_url]
+    print(f"Classifying {len(unclassified)} unique new articles for {len(pending)} symbols")
+    texts = [articles_by_url[url]['summary'] for url in unclassified]
+    batch_size = current_app.config['CLASSIFY_BATCH_SIZE']
+    for j, analysis in classify_concurrently(texts, max_workers=max_workers, batch_size=batch_size):
+        url = unclassified[j]
+        classification_by_url[url] = analysis
+        for symbol in sorted(symbols_by_url[url]):
+            classified_by_symbol[symbol] += 1
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'classify',
+                   'total_news': total_by_symbol[symbol], 'classified_news': classified_by_symbol[symbol]}
+
+    # Current and future prices for all symbols with as few downloads as possible
+    future_dates = [base_date + timedelta(days=days_ahead) for days_ahead in [1, 2, 3, 7]]
+    today = datetime.now().date()
+    price_dates = [date for date in [base_date, *future_dates] if date <= today]
+    stock_values = {}
+    if base_date == today:
+        # Today's predictions use the live quote instead of a closing price
+        price_dates.remove(base_date)
+        stock_values = {symbol: get_price_now(symbol) for symbol in pending}
+    prices = get_closing_prices([(symbol, date) for symbol in pending for date in price_dates])
+    for symbol in pending:
+        stock_values.setdefault(symbol, prices.get((symbol, base_date)))
+
+    save_closing_prices([(symbol, date, stock_values[symbol] if date == base_date else prices.get((symbol, date)))
+                         for symbol in pending for date in [base_date, *future_dates]])
+
+    # Save every prediction in a single transaction
+    date_time = _prediction_date_time(date_str)
+    predictions = []
+    results = []
+    for symbol in pending:
+        news = news_by_symbol[symbol]
+        classifications = [classification_by_url[article['url']] for article in news]
+        if base_date == today:
+            ingest(symbol, news, classifications)
+        if stock_values[symbol] is None:
+            # Predictions need a stock value, one missing price mustn't fail the whole batch
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped',
+                   'message': f'No price for {symbol} on {date_str}, prediction not saved'}
+            continue
+        summary = _summarize(classifications)
+        predictions.append(dict(symbol=symbol, date_time=date_time, stock_value=stock_values[symbol],
+                                news_articles=news, classifications=classifications, **summary))
+        results.append({'symbol': symbol, **{key: round(value, 2) if isinstance(value, float) else value
+                                              for key, value in summary.items()}})
+
+    saved = set()
+    for prediction, status in zip(predictions, save_predictions(predictions)):
+        symbol = prediction['symbol']
+        if status == 'saved':
+            saved.add(symbol)
+        elif status == 'unknown':
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped',
+                   'message': f'Unknown company {symbol}, prediction not saved'}
+        else:
+            yield {'status': 'progress', 'symbol': symbol, 'stage': 'skipped',
+                   'message': f'Prediction for {symbol} on {date_str} already exists'}
+    results = [result for result in results if result['symbol'] in saved]
+    for result in results:
+        yield {'status': 'progress', 'symbol': result['symbol'], 'stage': 'saved'}
+
+    yield {
+        'status': 'complete',
+        'date': date_str,
+        'predictions': results,
+        'classifications_avoided': avoided_count,
+        'message': f"Saved {len(results)} of {len(symbols)} predictions for {base_date.strftime('%d.%m.%Y')}."
+    }
+
+
+def update_closing_prices(lookback_days):
+    """Fetch missing closing prices for predictions of the last `lookback_days` days
+
+    Runs as a background job; the only event is the final summary.
+    """
+    # Calculate the cutoff date
+    cutoff_date = datetime.now().date() - timedelta(days=lookback_days)
+    
+    # Get all predictions since cutoff date
+    predictions = predictions_since_query(cutoff_date).all()
+
+    updates_summary = {
+        'total_predictions_checked': 0,
+        'prices_updated': 0,
+        'weekend_dates_count': 0,
+        'holiday_dates_count': 0,
+        'symbols_updated': set(),
+        'price_updates': [],  # List to store detailed update information
+        'errors': []
+    }
+
+    future_days = [1, 2, 3, 7]
+
+    # Load every closing price we already have for these predictions in one query
+    existing_prices = {
+        (price.symbol, price.date_time): price.closing_price
+        for price in ClosingPrice.query.filter(
+            ClosingPrice.symbol.in_({prediction.symbol for prediction in predictions}),
+            ClosingPrice.date_time > cutoff_date
+        ).all()
+    }
+
+    closed_days = set()  # (symbol, date) pairs to mark as weekend or holiday
+    missing = set()  # (symbol, date) pairs to fetch from yfinance
+    
+    for prediction in predictions:
+        updates_summary['total_predictions_checked'] += 1
+        base_date = prediction.date_time.date()
+        
+        for days_ahead in future_days:
+            future_date = base_date + timedelta(days=days_ahead)
+            
+            # Skip if the future date is in the future (prices not available yet)
+            if future_date >= datetime.now().date():
+                continue
+            
+            # Check if it's a weekend
+            if future_date.weekday() >= 5:
+                updates_summary['weekend_dates_count'] += 1
+                closed_days.add((prediction.symbol, future_date))
+                continue
+            
+            # Check if it's a holiday
+            if is_market_holiday(future_date):
+                updates_summary['holiday_dates_count'] += 1
+                closed_days.add((prediction.symbol, future_date))
+                continue
+            
+            # If price doesn't exist or is None, try to fetch it
+            if existing_prices.get((prediction.symbol, future_date)) is None:
+                missing.add((prediction.symbol, future_date))
+
+    # Save the weekend and holiday information
+    save_closing_prices([(symbol, date, None) for symbol, date in closed_days])
+
+    # Fetch all missing prices with one download per date window and save them together
+    if missing:
+        try:
+            fetched = get_closing_prices(missing)
+        except Exception as e:
+            fetched = {}
+            updates_summary['errors'].append(f"Error fetching closing prices: {str(e)}")
+
+        new_prices = []
+        for symbol, date in sorted(missing):
+            closing_price = fetched.get((symbol.upper(), date))
+            if closing_price is None:
+                continue
+            new_prices.append((symbol, date, closing_price))
+            updates_summary['prices_updated'] += 1
+            updates_summary['symbols_updated'].add(symbol)
+
+            # Add detailed update information
+            updates_summary['price_updates'].append({
+                'symbol': symbol,
+                'price_date': date.strftime('%Y-%m-%d'),
+                'closing_price': closing_price
+            })
+
+        try:
+            save_closing_prices(new_prices)
+        except Exception as e:
+            updates_summary['errors'].append(f"Error saving closing prices: {str(e)}")
+
+    # Convert set to list for JSON serialization
+    updates_summary['symbols_updated'] = list(updates_summary['symbols_updated'])
+    
+    # Update the last price update timestamp if any prices were updated
+    update_last_price_timestamp()
+    
+    yield {
+        'status': 'success',
+        'summary': updates_summary
+    }
+
+
+def submit_prediction(symbol, date_str):
+    """Queue a prediction job, identical (symbol, date) requests share one job"""
+    return scheduler.submit('prediction', f"prediction:{symbol.upper()}:{date_str}", run_prediction, symbol, date_str)
+
+
+def submit_predictions(symbols, date_str):
+    """Queue a batch prediction job, identical symbol lists share one job"""
+    key = f"predictions:{','.join(sorted(set(symbols)))}:{date_str}"
+    return scheduler.submit('predictions', key, run_predictions, symbols, date_str)
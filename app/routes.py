@@ -1,40 +1,105 @@
-from datetime import datetime, time as dt_time, timedelta
-from zoneinfo import ZoneInfo
-from flask import Blueprint, jsonify, request, Response, stream_with_context
-import json
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request, Response, stream_with_context
 
 #from app.claude_test import get_news_content_with_claude
-from app.news_requester import check_market_holiday, get_closing_price_at_date, get_company_name_by_symbol, get_price_now, get_news_FINNHUB
+from app.storage.price_store import get_closing_price_at_date
 from app.storage.storage import (
-    get_all_predictions, 
+    get_predictions as get_predictions_page,
     get_all_symbols, 
-    prediction_for_company_and_date_exists, 
-    save_prediction, 
     save_closing_price,
-    update_last_price_timestamp,
     get_last_price_update,
     get_prediction_with_details
 )
-from app.utils import save_future_closing_prices
-from .ai import classify_text
+from app.storage.classification_cache import classification_cache
+from app.storage.outcomes import get_accuracy
+from app.storage.rolling_sentiment import get_rolling_sentiment
+from app.jobs import format_sse, scheduler
+from app.metrics import registry
+from app import pipeline
+from .ai import classify_text, classify_texts
+from .classifiers import ClassificationError, router
 from app import db
-from app.storage.db_models import PredictionSummary, ClosingPrice
-from app.storage.db_models import ClassifiedNews
+from app.storage.db_models import Job
 
 bp = Blueprint('routes', __name__)
 
 @bp.route('/analyze', methods=['POST'])
 def analyze():
   data = request.get_json()
-  text = data.get('text')
-  result = classify_text(text)
-  return jsonify(result)
+  texts = data.get('texts')
+  try:
+    if texts is not None:
+      # Batch mode: classify a list of texts with as few requests as possible
+      if not isinstance(texts, list):
+        return jsonify({'status': 'error', 'message': "'texts' must be a list"}), 400
+      results = classify_texts(texts, batch_size=current_app.config['CLASSIFY_BATCH_SIZE'])
+      return jsonify(results)
+
+    text = data.get('text')
+    result = classify_text(text)
+    return jsonify(result)
+  except ClassificationError as e:
+    return jsonify({'status': 'error', 'message': str(e)}), 503
+
+
+@bp.route('/classification_cache', methods=['GET'])
+def get_classification_cache_stats():
+    """Get hit/miss counters of the classification cache"""
+    return jsonify(classification_cache.stats())
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latencies, query counts and cache hit ratios in the Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/classifier_backends', methods=['GET'])
+def get_classifier_backends():
+    """Get circuit state, error rate and latency of each classifier backend, in fallback order"""
+    return jsonify(router.stats())
 
 
 @bp.route('/predictions', methods=['GET'])
 def get_predictions():
-    result = get_all_predictions()
-    return jsonify(result)
+    """List predictions newest first
+
+    Query parameters (all optional):
+        symbol: filter by symbol
+        from, to: filter by prediction date range (YYYY-MM-DD, inclusive)
+        fields: comma separated response keys to return, e.g. fields=symbol,date_time
+        limit, cursor: keyset pagination; when given the response is wrapped as
+                       {"predictions": [...], "next_cursor": ...}
+    """
+    try:
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Dates must be formatted as YYYY-MM-DD'}), 400
+
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0:
+        return jsonify({'status': 'error', 'message': 'limit must be a positive number'}), 400
+
+    fields = request.args.get('fields')
+    fields = {field.strip() for field in fields.split(',') if field.strip()} if fields else None
+    cursor = request.args.get('cursor')
+
+    try:
+        predictions, next_cursor = get_predictions_page(
+            symbol=request.args.get('symbol'),
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=limit,
+            fields=fields
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if limit is None and cursor is None:
+        return jsonify(predictions)
+    return jsonify({'predictions': predictions, 'next_cursor': next_cursor})
 
 
 @bp.route('/predictions/<int:prediction_id>', methods=['GET'])
@@ -46,6 +111,52 @@ def get_prediction_details(prediction_id):
     return jsonify(prediction)
 
 
+@bp.route('/accuracy', methods=['GET'])
+def get_accuracy_stats():
+    """Hit rates of predictions per horizon, for one symbol (?symbol=) or globally and per symbol"""
+    return jsonify(get_accuracy(request.args.get('symbol')))
+
+
+@bp.route('/sentiment/<symbol>', methods=['GET'])
+def get_sentiment(symbol):
+    """Rolling sentiment of a symbol over the news window of a prediction for today, without classifying anything"""
+    return jsonify(get_rolling_sentiment(symbol))
+
+
+@bp.route('/backtest', methods=['GET'])
+def backtest():
+    """Sweep sentiment thresholds over stored predictions and prices
+
+    Query parameters (all optional): min_threshold, max_threshold, steps,
+    horizons (comma separated days), allow_short, sort_by, top
+    """
+    from app.backtest import HORIZONS, sweep
+
+    try:
+        horizons = [int(h) for h in request.args.get('horizons', '').split(',') if h.strip()] or None
+        if horizons and any(h not in HORIZONS for h in horizons):
+            raise ValueError(f"horizons must be within {HORIZONS}")
+        steps = request.args.get('steps', 1000, type=int)
+        if not 1 <= steps <= 100000:
+            raise ValueError("steps must be between 1 and 100000")
+        sort_by = request.args.get('sort_by', 'sharpe')
+        if sort_by not in ('sharpe', 'hit_rate', 'total_return', 'mean_return'):
+            raise ValueError("sort_by must be one of sharpe, hit_rate, total_return, mean_return")
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    result = sweep(
+        min_threshold=request.args.get('min_threshold', 0.0, type=float),
+        max_threshold=request.args.get('max_threshold', 1.0, type=float),
+        steps=steps,
+        horizons=horizons,
+        allow_short=request.args.get('allow_short', 'true').lower() == 'true',
+        sort_by=sort_by,
+        top=request.args.get('top', 20, type=int)
+    )
+    return jsonify(result)
+
+
 @bp.route('/symbols', methods=['GET'])
 def get_symbols():
     result = get_all_symbols()
@@ -62,120 +173,25 @@ def make_prediction():
     if not date_str:
         date_str = datetime.now().strftime('%Y-%m-%d')
 
-    def generate_updates():
-        #check if prediction for date and company already exists
-        if prediction_for_company_and_date_exists(symbol, date_str):
-            print(f"Prediction for {symbol} on {date_str} already exists")
-            yield f"data: {json.dumps({'status': 'error', 'message': f'Prediction for {symbol} on {date_str} already exists'})}\n\n"
-            return
-
-        news = get_news_FINNHUB(symbol, date_str)
-        total_news_count = len(news)
-        print(f"news for {symbol}: {total_news_count}")
-        
-        if total_news_count == 0:
-            yield f"data: {json.dumps({'status': 'error', 'message': f'No news for {symbol}.'})}\n\n"
-            return
-
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-
-        positive_probability = 0
-        negative_probability = 0
-        neutral_probability = 0
-
-        # Store classifications for later use
-        classifications = []
-
-        # Send initial total count
-        yield f"data: {json.dumps({'status': 'progress', 'total_news': total_news_count, 'classified_news': 0})}\n\n"
-
-        for i, article in enumerate(news, 1):
-            # Check if article already exists and has been classified
-            existing_news = ClassifiedNews.query.filter_by(url=article['url']).first()
-            
-            if existing_news:
-                # Use existing classification
-                analysis = {
-                    'sentiment': existing_news.classification,
-                    'probabilities': {
-                        existing_news.classification: existing_news.confidence_score,
-                        # Set other probabilities to 0 since we don't store them
-                        'Positive': existing_news.confidence_score if existing_news.classification == 'Positive' else 0,
-                        'Negative': existing_news.confidence_score if existing_news.classification == 'Negative' else 0,
-                        'Neutral': existing_news.confidence_score if existing_news.classification == 'Neutral' else 0
-                    }
-                }
-                print(f"Using existing classification ({i}/{total_news_count}): {analysis}")
-            else:
-                # Perform new classification
-                analysis = classify_text(article['summary'])
-                print(f"New classification ({i}/{total_news_count}): {analysis}")
-
-            classifications.append(analysis)  # Store the classification
-
-            if analysis['sentiment'] == "Positive":
-                positive_count += 1
-            elif analysis['sentiment'] == "Negative":
-                negative_count += 1
-            elif analysis['sentiment'] == "Neutral":
-                neutral_count += 1
-
-            positive_probability += analysis['probabilities']['Positive']
-            negative_probability += analysis['probabilities']['Negative']
-            neutral_probability += analysis['probabilities']['Neutral']
-
-            # Send progress update after each classification
-            yield f"data: {json.dumps({'status': 'progress', 'total_news': total_news_count, 'classified_news': i})}\n\n"
-
-        print(f"Sentiment Summary for {symbol}:")
-        print(f"Positive: {positive_count} ({positive_probability})")
-        print(f"Negative: {negative_count} ({negative_probability})")
-        print(f"Neutral: {neutral_count} ({neutral_probability})")
-
-        if date_str == datetime.now().strftime('%Y-%m-%d'):
-            stock_value = get_price_now(symbol)
-            date_time = datetime.combine(datetime.strptime(date_str, "%Y-%m-%d").date(), datetime.now(ZoneInfo("Europe/Berlin")).time())
-        else:
-            stock_value = get_closing_price_at_date(symbol, date_str)
-            date_time = datetime.combine(datetime.strptime(date_str, "%Y-%m-%d").date(), dt_time(hour=23, minute=59, second=59))
-
-        base_date: datetime.date = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-        # Save current stock price
-        save_closing_price(symbol, base_date, stock_value)
-
-        # Save future closing prices
-        save_future_closing_prices(symbol, base_date)
-
-        # Save prediction with news articles
-        save_prediction(symbol, date_time, positive_count, negative_count, neutral_count, positive_probability, 
-                        negative_probability, neutral_probability, stock_value, news_articles=news, classifications=classifications)
-        
-        final_result = {
-            "status": "complete",
-            "symbol": symbol,
-            "positive_count": positive_count,
-            "negative_count": negative_count,
-            "neutral_count": neutral_count,
-            "positive_probability": round(positive_probability, 2),
-            "negative_probability": round(negative_probability, 2),
-            "neutral_probability": round(neutral_probability, 2),
-            "message": f"Prediction and sentiment summary for {symbol} on {datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m.%Y')} saved successfully."
-        }
+    # The work runs as a background job, identical (symbol, date) requests share one job
+    job = pipeline.submit_prediction(symbol, date_str)
+    return _stream_job(job)
 
-        yield f"data: {json.dumps(final_result)}\n\n"
 
-    return Response(
-        stream_with_context(generate_updates()),
-        mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
-            'Content-Type': 'text/event-stream'
-        }
-    )
+@bp.route('/make_predictions', methods=['GET'])
+def make_predictions():
+    """Make predictions for a comma separated list of symbols, streaming progress per symbol"""
+    symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+    date_str = request.args.get('date')
+
+    if not symbols:
+        return jsonify({'status': 'error', 'message': 'Symbols are required'}), 400
+
+    if not date_str:
+        date_str = datetime.now().strftime('%Y-%m-%d')
+
+    job = pipeline.submit_predictions(symbols, date_str)
+    return _stream_job(job)
 
 
 @bp.route('/check_prediction', methods=['GET'])
@@ -218,90 +234,60 @@ def set_closing_price():
 
 @bp.route('/update_closing_prices', methods=['POST'])
 def update_closing_prices():
-    # Get lookback days from request, default to 7 days
+    # Get lookback days from request, default to 31 days
     data = request.get_json(silent=True) or {}
     lookback_days = data.get('lookback_days', 31)
-    
-    # Calculate the cutoff date
-    cutoff_date = datetime.now().date() - timedelta(days=lookback_days)
-    
-    # Get all predictions since cutoff date
-    predictions = PredictionSummary.query.filter(
-        db.func.date(PredictionSummary.date_time) >= cutoff_date
-    ).order_by(PredictionSummary.date_time.desc()).all()
-
-    updates_summary = {
-        'total_predictions_checked': 0,
-        'prices_updated': 0,
-        'weekend_dates_count': 0,
-        'holiday_dates_count': 0,
-        'symbols_updated': set(),
-        'price_updates': [],  # List to store detailed update information
-        'errors': []
-    }
-
-    future_days = [1, 2, 3, 7]
-    
-    for prediction in predictions:
-        updates_summary['total_predictions_checked'] += 1
-        base_date = prediction.date_time.date()
-        
-        for days_ahead in future_days:
-            future_date = base_date + timedelta(days=days_ahead)
-            
-            # Skip if the future date is in the future (prices not available yet)
-            if future_date >= datetime.now().date():
-                continue
-            
-            # Check if it's a weekend
-            if future_date.weekday() >= 5:
-                updates_summary['weekend_dates_count'] += 1
-                # Save the weekend information
-                save_closing_price(prediction.symbol, future_date, None)
-                continue
-            
-            # Check if it's a holiday
-            if check_market_holiday(future_date):
-                updates_summary['holiday_dates_count'] += 1
-                # Save the holiday information
-                save_closing_price(prediction.symbol, future_date, None)
-                continue
-                
-            # Check if we already have this price
-            existing_price = ClosingPrice.query.filter_by(
-                symbol=prediction.symbol,
-                date_time=future_date
-            ).first()
-            
-            # If price doesn't exist or is None, try to fetch it
-            if not existing_price or existing_price.closing_price is None:
-                try:
-                    closing_price = get_closing_price_at_date(prediction.symbol, future_date.strftime('%Y-%m-%d'))
-                    if closing_price is not None:
-                        save_closing_price(prediction.symbol, future_date, closing_price)
-                        updates_summary['prices_updated'] += 1
-                        updates_summary['symbols_updated'].add(prediction.symbol)
-                        
-                        # Add detailed update information
-                        updates_summary['price_updates'].append({
-                            'symbol': prediction.symbol,
-                            'price_date': future_date.strftime('%Y-%m-%d'),
-                            'closing_price': closing_price
-                        })
-                except Exception as e:
-                    updates_summary['errors'].append(f"Error updating {prediction.symbol} for {future_date}: {str(e)}")
-
-    # Convert set to list for JSON serialization
-    updates_summary['symbols_updated'] = list(updates_summary['symbols_updated'])
-    
-    # Update the last price update timestamp if any prices were updated
-    update_last_price_timestamp()
-    
+
+    job = scheduler.submit('update_closing_prices', f"update_closing_prices:{lookback_days}",
+                           pipeline.update_closing_prices, lookback_days)
+    return jsonify({'status': 'queued', 'job_id': job.id}), 202
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the persisted status of a background job"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    scheduler.reconcile(job)
     return jsonify({
-        'status': 'success',
-        'summary': updates_summary
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'progress': job.progress,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'updated_at': job.updated_at.isoformat()
     })
 
+
+@bp.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Stream the progress events of a running job (or replay those of a recently finished one)"""
+    job = scheduler.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return _stream_job(job)
+
+
+def _stream_job(job):
+    def generate_updates():
+        for event in scheduler.stream(job):
+            yield format_sse(event, job.id)
+
+    return Response(
+        stream_with_context(generate_updates()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'Content-Type': 'text/event-stream'
+        }
+    )
+
+
 @bp.route('/last_price_update', methods=['GET'])
 def get_last_update():
     """Get the timestamp of the last price update"""
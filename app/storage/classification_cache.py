@@ -0,0 +1,145 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.storage.db_models import CachedClassification
+from config import Config
+
+
+def normalize_text(text):
+    """Normalize text so trivially different copies of the same summary share a cache entry"""
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+
+def cache_key(text, model, prompt_version):
+    """Content address of a classification: hash of normalized text, model and prompt version"""
+    payload = f"{model}\x00{prompt_version}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ClassificationCache:
+    """Two tier classification cache.
+
+    An in-process LRU with TTL sits in front of the classification_cache table.
+    The database tier is only used while an app context is active, so worker
+    threads without one still benefit from the memory tier.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, db_ttl_days):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_ttl = timedelta(days=db_ttl_days)
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _memory_get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _memory_set(self, key, result):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        """Look up many keys at once, returning a dict of the ones that were found"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                result = self._memory_get(key)
+                if result is not None:
+                    found[key] = result
+            self.memory_hits += len(found)
+
+        missing = [key for key in set(keys) if key not in found]
+        if missing and has_app_context():
+            cutoff = datetime.now() - self.db_ttl
+            rows = CachedClassification.query.filter(
+                CachedClassification.key.in_(missing),
+                CachedClassification.created_at >= cutoff
+            ).all()
+            with self._lock:
+                for row in rows:
+                    result = {"sentiment": row.sentiment, "probabilities": row.probabilities}
+                    found[row.key] = result
+                    self._memory_set(row.key, result)
+                self.db_hits += len(rows)
+
+        with self._lock:
+            self.misses += len([key for key in set(keys) if key not in found])
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, results, model, prompt_version):
+        """Store a dict of key -> classification result in both tiers"""
+        if not results:
+            return
+
+        with self._lock:
+            for key, result in results.items():
+                self._memory_set(key, result)
+
+        if not has_app_context():
+            return
+
+        rows = [{
+            "key": key,
+            "model": model,
+            "prompt_version": prompt_version,
+            "sentiment": result["sentiment"],
+            "probabilities": result["probabilities"],
+            "created_at": datetime.now()
+        } for key, result in results.items()]
+        db.session.execute(insert(CachedClassification).values(rows).on_conflict_do_nothing(index_elements=['key']))
+        self._purge_expired()
+        db.session.commit()
+
+    def set(self, key, result, model, prompt_version):
+        self.set_many({key: result}, model, prompt_version)
+
+    def _purge_expired(self):
+        # Evict stale database rows at most once an hour
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        cutoff = datetime.now() - self.db_ttl
+        CachedClassification.query.filter(CachedClassification.created_at < cutoff).delete(synchronize_session=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                "memory_entries": len(self._entries)
+            }
+
+
+classification_cache = ClassificationCache(
+    max_entries=Config.CLASSIFICATION_CACHE_SIZE,
+    ttl_seconds=Config.CLASSIFICATION_CACHE_TTL,
+    db_ttl_days=Config.CLASSIFICATION_CACHE_DB_TTL_DAYS
+)
@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.news_requester import get_company_name_by_symbol
+from app.storage.db_models import Company
+from config import Config
+
+
+class CompanyRegistry:
+    """In-memory symbol -> company name map in front of the companies table.
+
+    The whole table is loaded on first use and kept up to date as companies
+    are added, so existence checks and names never need a query. New symbols
+    are resolved together: their Finnhub profiles are fetched concurrently and
+    inserted with one statement. Symbols Finnhub doesn't know are remembered
+    as unknown for `negative_ttl` seconds instead of being looked up again on
+    every write.
+    """
+
+    def __init__(self, negative_ttl, max_workers=4):
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self._names = None  # symbol -> name, None until loaded
+        self._unknown = {}  # symbol -> monotonic time until which it is treated as unknown
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Callers hold the lock
+        if self._names is None:
+            self._names = dict(db.session.query(Company.symbol, Company.name).all())
+
+    def name(self, symbol):
+        with self._lock:
+            self._load()
+            if symbol in self._names:
+                return self._names[symbol]
+        # Possibly added by another process since the map was loaded
+        return self._load_symbols([symbol]).get(symbol)
+
+    def _load_symbols(self, symbols):
+        # Pick up companies that exist in the table but not in the map yet
+        rows = dict(db.session.query(Company.symbol, Company.name).filter(Company.symbol.in_(symbols)).all())
+        with self._lock:
+            self._names.update(rows)
+        return rows
+
+    def symbols(self):
+        with self._lock:
+            self._load()
+            return list(self._names)
+
+    def names(self):
+        # Snapshot of symbol -> name for every known company
+        with self._lock:
+            self._load()
+            return dict(self._names)
+
+    def ensure(self, symbols):
+        """Make sure companies exist for every symbol, adding new ones in one batch
+
+        Returns the symbols that have a company; unknown ones are left out.
+        Raises if a profile couldn't be fetched, as the symbol may well exist.
+        """
+        symbols = {symbol.upper() for symbol in symbols}
+        now = time.monotonic()
+        with self._lock:
+            self._load()
+            missing = [symbol for symbol in symbols
+                       if symbol not in self._names and self._unknown.get(symbol, 0) < now]
+
+        if missing:
+            loaded = self._load_symbols(missing)
+            missing = [symbol for symbol in missing if symbol not in loaded]
+        if missing:
+            self._resolve(missing)
+
+        with self._lock:
+            return {symbol for symbol in symbols if symbol in self._names}
+
+    def _resolve(self, symbols):
+        """Fetch the profiles of new symbols concurrently and insert the companies that were found
+
+        Only symbols whose profile came back empty are cached as unknown. A
+        failed fetch (timeout, 429, 5xx) is raised after the others are
+        stored, so a valid symbol isn't dropped for negative_ttl seconds.
+        """
+        # Workers get their own app context so profiles are read through the database tier of the response cache
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def fetch(symbol):
+            if app is None:
+                return get_company_name_by_symbol(symbol)
+            with app.app_context():
+                return get_company_name_by_symbol(symbol)
+
+        names, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(symbols)))) as executor:
+            futures = {symbol: executor.submit(fetch, symbol) for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    names[symbol] = future.result()
+                except Exception as e:
+                    print(f"Could not fetch the company profile of {symbol}: {e}")
+                    errors[symbol] = e
+
+        found = {symbol: name for symbol, name in names.items() if name}
+        if found:
+            db.session.execute(insert(Company).values([
+                {'symbol': symbol, 'name': name} for symbol, name in found.items()
+            ]).on_conflict_do_nothing(index_elements=['symbol']))
+            db.session.commit()
+
+        expires_at = time.monotonic() + self.negative_ttl
+        with self._lock:
+            self._names.update(found)
+            for symbol, name in names.items():
+                if not name:
+                    print(f"Unknown symbol {symbol}, not retrying for {self.negative_ttl}s")
+                    self._unknown[symbol] = expires_at
+
+        if errors:
+            raise next(iter(errors.values()))
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'companies': len(self._names) if self._names is not None else None,
+                'unknown_symbols': sum(1 for expires_at in self._unknown.values() if expires_at >= now)
+            }
+
+
+company_registry = CompanyRegistry(negative_ttl=Config.COMPANY_NEGATIVE_TTL)
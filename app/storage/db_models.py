@@ -36,6 +36,7 @@ class PredictionSummary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(10), db.ForeignKey('companies.symbol'), nullable=False, index=True)
     date_time = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    prediction_date = db.Column(db.Date, nullable=False)  # date_time's day, stored so day lookups can use an index
     positive_count = db.Column(db.Integer, nullable=False)
     negative_count = db.Column(db.Integer, nullable=False)
     neutral_count = db.Column(db.Integer, nullable=False)
@@ -54,6 +55,13 @@ class PredictionSummary(db.Model):
         lazy='dynamic'
     )
 
+    __table_args__ = (
+        # Matches the (date_time desc, id desc) keyset used to paginate the prediction list
+        db.Index('ix_prediction_summaries_date_time_id', 'date_time', 'id'),
+        # One prediction per symbol and day, also the index for (symbol, day) lookups
+        db.UniqueConstraint('symbol', 'prediction_date', name='uq_prediction_summaries_symbol_date'),
+    )
+
     def __repr__(self):
         return f"<PredictionSummary {self.symbol} - {self.date_time}>"
 
@@ -83,6 +91,166 @@ class ClassifiedNews(db.Model):
     date_time = db.Column(db.DateTime, nullable=False, index=True)
     classification = db.Column(db.String(20), nullable=False)  # 'Positive', 'Negative', or 'Neutral'
     confidence_score = db.Column(db.Float, nullable=False)
+    backend = db.Column(db.String(20), nullable=True)  # Classifier backend that produced it, unknown for older rows
+
+    def __repr__(self):
+        return f"<ClassifiedNews {self.title[:30]}... - {self.classification}>"
+
+class CachedClassification(db.Model):
+    __tablename__ = 'classification_cache'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of normalized text, model and prompt version
+    model = db.Column(db.String(50), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    sentiment = db.Column(db.String(20), nullable=False)  # 'Positive', 'Negative', or 'Neutral'
+    probabilities = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<CachedClassification {self.key[:12]}... - {self.sentiment}>"
+
+
+
+class MarketHoliday(db.Model):
+    __tablename__ = 'market_holidays'
+
+    id = db.Column(db.Integer, primary_key=True)
+    exchange = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    event_name = db.Column(db.String(100), nullable=True)
+    is_full_day = db.Column(db.Boolean, nullable=False, default=True)  # False for early closes
+
+    __table_args__ = (
+        db.UniqueConstraint('exchange', 'date', name='uq_exchange_holiday_date'),
+    )
+
+    def __repr__(self):
+        return f"<MarketHoliday {self.exchange} {self.date} - {self.event_name}>"
+
+
+
+class DailyBar(db.Model):
+    __tablename__ = 'daily_bars'
+
+    symbol = db.Column(db.String(10), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)  # (symbol, date) primary key doubles as the range scan index
+    open = db.Column(db.Float, nullable=True)
+    high = db.Column(db.Float, nullable=True)
+    low = db.Column(db.Float, nullable=True)
+    close = db.Column(db.Float, nullable=True)
+    volume = db.Column(db.BigInteger, nullable=True)
+
+    def __repr__(self):
+        return f"<DailyBar {self.symbol} {self.date} - {self.close}>"
+
+
+class PriceCoverage(db.Model):
+    __tablename__ = 'price_coverage'
+
+    symbol = db.Column(db.String(10), primary_key=True)
+    first_date = db.Column(db.Date, nullable=False)  # Earliest date whose bars have been fetched
+    last_date = db.Column(db.Date, nullable=False)  # High-water mark, bars up to here have been fetched
+
+    def __repr__(self):
+        return f"<PriceCoverage {self.symbol} {self.first_date} - {self.last_date}>"
+
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(36), primary_key=True)  # uuid4
+    kind = db.Column(db.String(50), nullable=False)  # e.g. 'prediction' or 'update_closing_prices'
+    key = db.Column(db.String(200), nullable=False, index=True)  # Identical work shares a key
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'succeeded' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    progress = db.Column(db.JSON, nullable=True)  # Last event published by the job
+    result = db.Column(db.JSON, nullable=True)  # Final event published by the job
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.key} - {self.status}>"
+
+
+
+class CachedResponse(db.Model):
+    __tablename__ = 'api_response_cache'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of endpoint and parameters
+    endpoint = db.Column(db.String(100), nullable=False)
+    body = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # NULL never expires
+
+    def __repr__(self):
+        return f"<CachedResponse {self.endpoint} {self.key[:12]}...>"
+
+
+
+class PredictionOutcome(db.Model):
+    __tablename__ = 'prediction_outcomes'
+
+    prediction_id = db.Column(db.Integer, db.ForeignKey('prediction_summaries.id', ondelete='CASCADE'), primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False, index=True)
+    direction = db.Column(db.Integer, nullable=False)  # 1 positive, -1 negative, 0 no call
+    base_price = db.Column(db.Float, nullable=True)
+
+    # Returns relative to base_price and whether the predicted direction was right, NULL until known
+    return_1d = db.Column(db.Float, nullable=True)
+    return_2d = db.Column(db.Float, nullable=True)
+    return_3d = db.Column(db.Float, nullable=True)
+    return_7d = db.Column(db.Float, nullable=True)
+    hit_1d = db.Column(db.Boolean, nullable=True)
+    hit_2d = db.Column(db.Boolean, nullable=True)
+    hit_3d = db.Column(db.Boolean, nullable=True)
+    hit_7d = db.Column(db.Boolean, nullable=True)
+
+    def __repr__(self):
+        return f"<PredictionOutcome {self.prediction_id} {self.symbol}>"
+
+
+class AccuracyStat(db.Model):
+    __tablename__ = 'accuracy_stats'
+
+    symbol = db.Column(db.String(10), primary_key=True)  # '*' holds the totals over all symbols
+    horizon = db.Column(db.Integer, primary_key=True)  # Days ahead: 1, 2, 3 or 7
+    evaluated = db.Column(db.Integer, nullable=False, default=0)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AccuracyStat {self.symbol} {self.horizon}d {self.hits}/{self.evaluated}>"
+
+
+class SentimentArticle(db.Model):
+    __tablename__ = 'sentiment_articles'
+
+    # Articles inside the rolling window of a symbol, each counted once in its sentiment_state
+    symbol = db.Column(db.String(10), primary_key=True)
+    url = db.Column(db.String(1000), primary_key=True)
+    published_at = db.Column(db.DateTime, nullable=False, index=True)
+    sentiment = db.Column(db.String(20), nullable=False)  # 'Positive', 'Negative', or 'Neutral'
+    positive_probability = db.Column(db.Float, nullable=False)
+    negative_probability = db.Column(db.Float, nullable=False)
+    neutral_probability = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<SentimentArticle {self.symbol} {self.url[:30]}... - {self.sentiment}>"
+
+
+class SentimentState(db.Model):
+    __tablename__ = 'sentiment_state'
+
+    # Running totals over a symbol's sentiment_articles, changed by increments only
+    symbol = db.Column(db.String(10), primary_key=True)
+    positive_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_count = db.Column(db.Integer, nullable=False, default=0)
+    neutral_count = db.Column(db.Integer, nullable=False, default=0)
+    positive_probability = db.Column(db.Float, nullable=False, default=0.0)
+    negative_probability = db.Column(db.Float, nullable=False, default=0.0)
+    neutral_probability = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
     def __repr__(self):
-        return f"<ClassifiedNews {self.title[:30]}... - {self.classification}>"
\ No newline at end of file
+        return f"<SentimentState {self.symbol} +{self.positive_count} -{self.negative_count} ={self.neutral_count}>"
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.storage.db_models import AccuracyStat, ClosingPrice, PredictionOutcome, PredictionSummary
+
+HORIZONS = [1, 2, 3, 7]  # Same offsets as the future prices of a prediction
+ALL_SYMBOLS = '*'  # accuracy_stats row holding the totals over every symbol
+
+
+def _direction(prediction):
+    # 1 if the prediction leans positive, -1 if negative, 0 if it makes no call
+    signal = float(prediction.positive_probability) - float(prediction.negative_probability)
+    return (signal > 0) - (signal < 0)
+
+
+def _set_horizon(outcome, horizon, price, deltas):
+    """Store the return and hit flag of one horizon, collecting the accuracy counter changes"""
+    old_hit = getattr(outcome, f'hit_{horizon}d')
+
+    if price is None or not outcome.base_price:
+        new_return, new_hit = None, None
+    else:
+        new_return = price / outcome.base_price - 1
+        new_hit = None if outcome.direction == 0 else outcome.direction * new_return > 0
+
+    setattr(outcome, f'return_{horizon}d', new_return)
+    setattr(outcome, f'hit_{horizon}d', new_hit)
+
+    if old_hit != new_hit:
+        for symbol in (outcome.symbol, ALL_SYMBOLS):
+            evaluated, hits = deltas[(symbol, horizon)]
+            if old_hit is not None:
+                evaluated, hits = evaluated - 1, hits - int(old_hit)
+            if new_hit is not None:
+                evaluated, hits = evaluated + 1, hits + int(new_hit)
+            deltas[(symbol, horizon)] = (evaluated, hits)
+
+
+def _apply_deltas(deltas):
+    # Increment the counters in SQL so concurrent writers can't lose updates
+    rows = [{'symbol': symbol, 'horizon': horizon, 'evaluated': evaluated, 'hits': hits}
+            for (symbol, horizon), (evaluated, hits) in deltas.items() if evaluated or hits]
+    if not rows:
+        return
+    statement = insert(AccuracyStat).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['symbol', 'horizon'],
+        set_={
+            'evaluated': AccuracyStat.evaluated + statement.excluded.evaluated,
+            'hits': AccuracyStat.hits + statement.excluded.hits
+        }
+    ))
+
+
+def _new_outcome(prediction, deltas):
+    # Create the outcome of a prediction from the closing prices that are already stored
+    outcome = PredictionOutcome(
+        prediction_id=prediction.id,
+        symbol=prediction.symbol,
+        direction=_direction(prediction),
+        base_price=prediction.stock_value
+    )
+    db.session.add(outcome)
+
+    base_date = prediction.date_time.date()
+    prices = ClosingPrice.query.filter(
+        ClosingPrice.symbol == prediction.symbol,
+        ClosingPrice.date_time.in_([base_date + timedelta(days=horizon) for horizon in HORIZONS])
+    ).all()
+    price_by_date = {price.date_time: price.closing_price for price in prices}
+    for horizon in HORIZONS:
+        _set_horizon(outcome, horizon, price_by_date.get(base_date + timedelta(days=horizon)), deltas)
+    return outcome
+
+
+def record_prediction_outcome(prediction):
+    """Create the outcome row of a newly added prediction, without committing"""
+    deltas = defaultdict(lambda: (0, 0))
+    _new_outcome(prediction, deltas)
+    _apply_deltas(deltas)
+
+
+def apply_closing_prices(prices):
+    """Update the outcomes of every prediction affected by newly written closing prices
+
+    Only predictions made 1, 2, 3 or 7 days before one of the written dates are
+    touched, so each price write costs a bounded amount of work. Does not commit.
+
+    Args:
+        prices: Iterable of (symbol, date, closing_price) as written to closing_prices
+    """
+    price_map = {(symbol, date): closing_price for symbol, date, closing_price in prices}
+    if not price_map:
+        return
+
+    dates = [date for _, date in price_map]
+    window_start = datetime.combine(min(dates) - timedelta(days=max(HORIZONS)), datetime.min.time())
+    window_end = datetime.combine(max(dates) - timedelta(days=min(HORIZONS) - 1), datetime.min.time())
+    predictions = PredictionSummary.query.filter(
+        PredictionSummary.symbol.in_({symbol for symbol, _ in price_map}),
+        PredictionSummary.date_time >= window_start,
+        PredictionSummary.date_time < window_end
+    ).all()
+    if not predictions:
+        return
+
+    # Lock the outcome rows until commit, so concurrent writers of the same close can't both see
+    # the old hit flag and count the change twice; ordered so lockers can't deadlock each other
+    outcomes = {
+        outcome.prediction_id: outcome
+        for outcome in PredictionOutcome.query.filter(
+            PredictionOutcome.prediction_id.in_([prediction.id for prediction in predictions])
+        ).order_by(PredictionOutcome.prediction_id).with_for_update().populate_existing().all()
+    }
+
+    deltas = defaultdict(lambda: (0, 0))
+    for prediction in predictions:
+        outcome = outcomes.get(prediction.id)
+        if outcome is None:
+            # Predictions saved before outcomes existed are filled in completely
+            _new_outcome(prediction, deltas)
+            continue
+
+        base_date = prediction.date_time.date()
+        for horizon in HORIZONS:
+            key = (prediction.symbol, base_date + timedelta(days=horizon))
+            if key in price_map:
+                _set_horizon(outcome, horizon, price_map[key], deltas)
+
+    _apply_deltas(deltas)
+
+
+def rebuild_outcomes():
+    """Recompute every outcome and counter from scratch, for backfilling existing data"""
+    PredictionOutcome.query.delete()
+    AccuracyStat.query.delete()
+    deltas = defaultdict(lambda: (0, 0))
+    for prediction in PredictionSummary.query.all():
+        _new_outcome(prediction, deltas)
+    db.session.flush()
+    _apply_deltas(deltas)
+    db.session.commit()
+
+
+def _format_stats(rows):
+    return {
+        f"{row.horizon}_day": {
+            'evaluated': row.evaluated,
+            'hits': row.hits,
+            'hit_rate': round(row.hits / row.evaluated, 4) if row.evaluated else None
+        }
+        for row in sorted(rows, key=lambda row: row.horizon)
+    }
+
+
+def get_accuracy(symbol=None):
+    """Hit rates per horizon, read straight from the accuracy counters
+
+    With a symbol only that symbol's counters are returned, otherwise the global
+    totals and every symbol's counters.
+    """
+    if symbol:
+        rows = AccuracyStat.query.filter_by(symbol=symbol.upper()).all()
+        return {'symbol': symbol.upper(), 'horizons': _format_stats(rows)}
+
+    by_symbol = defaultdict(list)
+    for row in AccuracyStat.query.all():
+        by_symbol[row.symbol].append(row)
+    return {
+        'global': _format_stats(by_symbol.pop(ALL_SYMBOLS, [])),
+        'symbols': {symbol: _format_stats(rows) for symbol, rows in sorted(by_symbol.items())}
+    }
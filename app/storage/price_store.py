@@ -0,0 +1,179 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.news_requester import get_daily_bars
+from app.single_flight import SingleFlight
+from app.storage.db_models import DailyBar, PriceCoverage
+
+
+class PriceStore:
+    """Local daily bar store with incremental backfill.
+
+    For every symbol the store remembers which date range has already been
+    downloaded (price_coverage). Lookups inside that range are answered from
+    memory, loaded once per symbol with a range scan over daily_bars. Lookups
+    outside it only download the missing head or tail, so repeat requests for
+    past dates never leave the process. Today and later dates are never
+    marked as covered because their close isn't final yet.
+    """
+
+    def __init__(self):
+        self._closes = {}  # symbol -> {date: close}
+        self._coverage = {}  # symbol -> (first_date, last_date) or None
+        self._lock = threading.Lock()
+
+    def _load_symbol(self, symbol):
+        # Load the persisted coverage and bars of a symbol into memory once
+        if symbol in self._coverage:
+            return
+
+        coverage = db.session.get(PriceCoverage, symbol)
+        closes = {}
+        if coverage is not None:
+            bars = DailyBar.query.filter(
+                DailyBar.symbol == symbol,
+                DailyBar.date.between(coverage.first_date, coverage.last_date)
+            ).all()
+            closes = {bar.date: bar.close for bar in bars}
+            self._coverage[symbol] = (coverage.first_date, coverage.last_date)
+        else:
+            self._coverage[symbol] = None
+        self._closes[symbol] = closes
+
+    def _missing_range(self, symbol, start, end):
+        # The part of [start, end] that still has to be downloaded, or None
+        coverage = self._coverage.get(symbol)
+        if coverage is None:
+            return start, end
+        first_date, last_date = coverage
+        if start >= first_date and end <= last_date:
+            return None
+        # Only the head before first_date and/or the tail after last_date are missing
+        fetch_start = start if start < first_date else last_date + timedelta(days=1)
+        fetch_end = end if end > last_date else first_date - timedelta(days=1)
+        return fetch_start, fetch_end
+
+    def _backfill(self, ranges):
+        """Download and persist the missing bars for {symbol: (start, end)}
+
+        Symbols missing the same window share one request, so a batch for one
+        date costs a single download while a symbol missing years of history
+        doesn't widen the window of every other symbol. Runs outside the lock
+        so lookups don't wait on each other's downloads. Coverage is extended
+        over the whole requested window of every symbol whose download
+        succeeded, even without bars (weekends, holidays, unknown symbols),
+        but not for failed downloads so those dates are tried again.
+        """
+        windows = {}
+        for symbol, window in ranges.items():
+            windows.setdefault(window, []).append(symbol)
+        bars = {}
+        for (start, end), symbols in windows.items():
+            bars.update(get_daily_bars(symbols, start, end))
+
+        rows = [{
+            'symbol': symbol,
+            'date': date,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume
+        } for symbol, symbol_bars in bars.items() for date, (open_, high, low, close, volume) in symbol_bars.items()]
+
+        if rows:
+            statement = insert(DailyBar).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=['symbol', 'date'],
+                set_={column: statement.excluded[column] for column in ('open', 'high', 'low', 'close', 'volume')}
+            )
+            db.session.execute(statement)
+
+        fetched = {symbol: ranges[symbol] for symbol in ranges if symbol in bars}
+        for symbol, (first_date, last_date) in fetched.items():
+            # least/greatest merge with coverage written concurrently by another process
+            statement = insert(PriceCoverage).values(symbol=symbol, first_date=first_date, last_date=last_date)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['symbol'],
+                set_={'first_date': func.least(PriceCoverage.first_date, statement.excluded.first_date),
+                      'last_date': func.greatest(PriceCoverage.last_date, statement.excluded.last_date)}
+            ))
+        db.session.commit()
+
+        for symbol, (start, end) in ranges.items():
+            if symbol not in fetched:
+                print(f"Download of {symbol} between {start} and {end} failed, coverage left unchanged")
+
+        with self._lock:
+            for symbol, (first_date, last_date) in fetched.items():
+                coverage = self._coverage.get(symbol)
+                if coverage is not None:
+                    first_date, last_date = min(coverage[0], first_date), max(coverage[1], last_date)
+                self._coverage[symbol] = (first_date, last_date)
+                self._closes[symbol].update({date: bar[3] for date, bar in bars[symbol].items()})
+
+    def get_closing_prices(self, pairs):
+        """Closing prices for many (symbol, date) pairs, backfilling anything not yet stored
+
+        Returns a dict of (symbol, date) -> closing price. Pairs without a bar
+        (weekends, holidays, dates in the future) are left out.
+        """
+        pairs = {(symbol.upper(), date) for symbol, date in pairs}
+        last_final_date = datetime.now().date() - timedelta(days=1)
+
+        with self._lock:
+            ranges = {}
+            for symbol, date in pairs:
+                if date > last_final_date:
+                    continue
+                self._load_symbol(symbol)
+                start, end = ranges.get(symbol, (date, date))
+                ranges[symbol] = (min(start, date), max(end, date))
+
+            missing = {}
+            for symbol, (start, end) in ranges.items():
+                missing_range = self._missing_range(symbol, start, end)
+                if missing_range is not None:
+                    missing[symbol] = (missing_range[0], min(missing_range[1], last_final_date))
+
+        if missing:
+            self._backfill(missing)
+
+        prices = {}
+        with self._lock:
+            for symbol, date in pairs:
+                close = self._closes.get(symbol, {}).get(date)
+                if close is not None:
+                    prices[(symbol, date)] = close
+
+        # Today's close isn't final yet, fetch it without storing it
+        recent = {(symbol, date) for symbol, date in pairs if date > last_final_date and date <= datetime.now().date()}
+        if recent:
+            bars = get_daily_bars({symbol for symbol, _ in recent}, min(d for _, d in recent), max(d for _, d in recent))
+            for symbol, date in recent:
+                bar = bars.get(symbol, {}).get(date)
+                if bar is not None:
+                    prices[(symbol, date)] = bar[3]
+
+        return prices
+
+
+price_store = PriceStore()
+
+
+def get_closing_prices(pairs):
+    return price_store.get_closing_prices(pairs)
+
+
+closing_price_flights = SingleFlight()
+
+
+def get_closing_price_at_date(symbol: str, date_str: str):
+    # Concurrent lookups of the same symbol and date share one computation
+    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    key = (symbol.upper(), date)
+    return closing_price_flights.do(key, lambda: price_store.get_closing_prices([key]).get(key))
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.storage.db_models import CachedResponse
+from config import Config
+
+FOREVER = timedelta.max  # TTL for responses that can never change, e.g. news windows in the past
+
+
+def response_key(endpoint, params):
+    """Cache key of a request: hash of the endpoint and its sorted parameters"""
+    payload = json.dumps([endpoint, sorted((params or {}).items())], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Read-through cache for API responses.
+
+    Responses are kept in an in-process LRU and persisted to the
+    api_response_cache table so restarts stay warm. The database tier is only
+    used while an app context is active.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at or None, body)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, body = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                del self._entries[key]
+
+        if has_app_context():
+            row = db.session.get(CachedResponse, key)
+            if row is not None and (row.expires_at is None or row.expires_at > now):
+                with self._lock:
+                    self._memory_set(key, row.expires_at, row.body)
+                    self.hits += 1
+                return row.body
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, endpoint, body, ttl):
+        expires_at = None if ttl == FOREVER else datetime.now() + ttl
+        with self._lock:
+            self._memory_set(key, expires_at, body)
+
+        if not has_app_context():
+            return
+
+        statement = insert(CachedResponse).values(
+            key=key, endpoint=endpoint, body=body, created_at=datetime.now(), expires_at=expires_at
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'body': body, 'created_at': datetime.now(), 'expires_at': expires_at}
+        ))
+        self._purge_expired()
+        db.session.commit()
+
+    def _purge_expired(self):
+        # Evict expired database rows at most once an hour, rows that never expire are kept
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        CachedResponse.query.filter(CachedResponse.expires_at < datetime.now()).delete(synchronize_session=False)
+
+    def _memory_set(self, key, expires_at, body):
+        self._entries[key] = (expires_at, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "memory_entries": len(self._entries)
+            }
+
+
+response_cache = ResponseCache(max_entries=Config.RESPONSE_CACHE_SIZE)
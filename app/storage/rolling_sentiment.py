@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.metrics import timed
+from app.storage.db_models import SentimentArticle, SentimentState
+
+WINDOW_DAYS = 2  # Same lookback as get_news_FINNHUB
+SENTIMENTS = ['Positive', 'Negative', 'Neutral']
+
+
+def _window_start():
+    # Articles published before this are outside the window of a prediction for today
+    return datetime.combine(datetime.now().date() - timedelta(days=WINDOW_DAYS), datetime.min.time())
+
+
+def _apply_deltas(symbol, rows, sign):
+    # Add (sign=1) or subtract (sign=-1) articles from the running totals with SQL increments
+    if not rows:
+        return
+    values = {'symbol': symbol, 'updated_at': datetime.now()}
+    for sentiment in SENTIMENTS:
+        name = sentiment.lower()
+        values[f'{name}_count'] = sign * sum(1 for row in rows if row.sentiment == sentiment)
+        values[f'{name}_probability'] = sign * sum(getattr(row, f'{name}_probability') for row in rows)
+
+    statement = insert(SentimentState).values(values)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['symbol'],
+        set_={
+            **{column: getattr(SentimentState, column) + getattr(statement.excluded, column)
+               for column in values if column not in ('symbol', 'updated_at')},
+            'updated_at': statement.excluded.updated_at
+        }
+    ))
+
+
+def _expire(symbol):
+    # Remove articles that left the window and subtract them, without committing
+    expired = db.session.execute(
+        delete(SentimentArticle)
+        .where(SentimentArticle.symbol == symbol, SentimentArticle.published_at < _window_start())
+        .returning(SentimentArticle.sentiment, SentimentArticle.positive_probability,
+                   SentimentArticle.negative_probability, SentimentArticle.neutral_probability)
+    ).all()
+    _apply_deltas(symbol, expired, -1)
+
+
+@timed('storage')
+def get_article_classifications(symbol, urls):
+    """Classifications of the given URLs that are already counted in the rolling state of a symbol"""
+    symbol = symbol.upper()
+    urls = list(urls)
+    if not urls:
+        return {}
+    rows = SentimentArticle.query.filter(
+        SentimentArticle.symbol == symbol,
+        SentimentArticle.url.in_(urls),
+        SentimentArticle.published_at >= _window_start()
+    ).all()
+    return {
+        row.url: {
+            'sentiment': row.sentiment,
+            'probabilities': {sentiment: getattr(row, f'{sentiment.lower()}_probability') for sentiment in SENTIMENTS},
+            'backend': None
+        }
+        for row in rows
+    }
+
+
+@timed('storage')
+def ingest(symbol, articles, classifications):
+    """Add newly classified articles to the rolling state of a symbol
+
+    Articles already counted or outside the window are ignored, so ingesting
+    the same news twice (or from concurrent runs) doesn't change the totals.
+    """
+    symbol = symbol.upper()
+    _expire(symbol)
+
+    window_start = _window_start()
+    rows = {}
+    for article, classification in zip(articles, classifications):
+        published_at = datetime.fromtimestamp(article['datetime'])
+        if published_at < window_start or article['url'] in rows:
+            continue
+        rows[article['url']] = {
+            'symbol': symbol,
+            'url': article['url'],
+            'published_at': published_at,
+            'sentiment': classification['sentiment'],
+            **{f'{sentiment.lower()}_probability': float(classification['probabilities'][sentiment])
+               for sentiment in SENTIMENTS}
+        }
+
+    if rows:
+        # Only rows that were actually inserted are added to the totals
+        inserted = db.session.execute(
+            insert(SentimentArticle).values(list(rows.values()))
+            .on_conflict_do_nothing(index_elements=['symbol', 'url'])
+            .returning(SentimentArticle.sentiment, SentimentArticle.positive_probability,
+                       SentimentArticle.negative_probability, SentimentArticle.neutral_probability)
+        ).all()
+        _apply_deltas(symbol, inserted, 1)
+    db.session.commit()
+
+
+@timed('storage')
+def get_rolling_sentiment(symbol):
+    """Current rolling sentiment of a symbol over the last WINDOW_DAYS days, without classifying anything"""
+    symbol = symbol.upper()
+    _expire(symbol)
+    db.session.commit()
+
+    state = db.session.get(SentimentState, symbol)
+    result = {'symbol': symbol, 'window_start': _window_start().isoformat(),
+              'updated_at': state.updated_at.isoformat() if state else None}
+    for sentiment in SENTIMENTS:
+        name = sentiment.lower()
+        result[f'{name}_count'] = getattr(state, f'{name}_count') if state else 0
+        result[f'{name}_probability'] = round(getattr(state, f'{name}_probability'), 2) if state else 0.0
+    result['article_count'] = result['positive_count'] + result['negative_count'] + result['neutral_count']
+    return result
@@ -1,7 +1,17 @@
-from app.news_requester import get_company_name_by_symbol, check_market_holiday
-from app.storage.db_models import Company, PredictionSummary, ClosingPrice, LastPriceUpdate, ClassifiedNews
+from app.trading_calendar import is_market_holiday
+from app.storage.company_registry import company_registry
+from app.storage.outcomes import apply_closing_prices, record_prediction_outcome
+from app.storage.db_models import PredictionSummary, ClosingPrice, LastPriceUpdate, ClassifiedNews, prediction_news
 from app import db
+from app.classifiers import router
+from app.metrics import timed
+from sqlalchemy import and_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 from datetime import timedelta, datetime
+import base64
+import binascii
 
 def update_last_price_timestamp():
     """Update the timestamp of the last price update"""
@@ -19,26 +29,42 @@ def get_last_price_update():
     return last_update.updated_at if last_update else None
 
 
+FUTURE_DAYS = [1, 2, 3, 7]
+
+
+def _query_predictions_with_future_prices(include_prices=True):
+    """Query predictions with the closing prices 1, 2, 3 and 7 days ahead
+
+    Every future price is an outer join against closing_prices, so the whole
+    result comes back in a single round-trip. Rows are
+    (PredictionSummary, ClosingPrice | None for each of FUTURE_DAYS). Company
+    names come from the company registry instead of a join.
+    With include_prices=False the price joins are skipped entirely.
+    """
+    base_date = PredictionSummary.prediction_date
+    price_aliases = [aliased(ClosingPrice, name=f"price_{days_ahead}_day") for days_ahead in FUTURE_DAYS]
+    if not include_prices:
+        price_aliases = []
+
+    query = db.session.query(PredictionSummary, *price_aliases)
+    for days_ahead, price in zip(FUTURE_DAYS, price_aliases):
+        query = query.outerjoin(price, and_(
+            price.symbol == PredictionSummary.symbol,
+            price.date_time == base_date + days_ahead
+        ))
+    return query
+
+
 def _build_prediction_response(prediction, include_news=False):
     """Helper function to build a consistent prediction response object
     
     Args:
-        prediction: Tuple of (PredictionSummary, Company) from a joined query
+        prediction: Row of (PredictionSummary, *ClosingPrice) from _query_predictions_with_future_prices
         include_news: Whether to include news articles in the response
     """
-    base_date = prediction.PredictionSummary.date_time.date()
-    future_days = [1, 2, 3, 7]
     future_prices = {}
     
-    for days_ahead in future_days:
-        future_date = base_date + timedelta(days=days_ahead)
-        
-        # Query for closing price on this future date
-        closing_price_entry = ClosingPrice.query.filter_by(
-            symbol=prediction.PredictionSummary.symbol, 
-            date_time=future_date
-        ).first()
-        
+    for days_ahead, closing_price_entry in zip(FUTURE_DAYS, prediction[1:]):
         price_info = {
             'price': None,
             'is_weekend': False,
@@ -55,7 +81,7 @@ def _build_prediction_response(prediction, include_news=False):
     response = {
         "id": prediction.PredictionSummary.id,
         "symbol": prediction.PredictionSummary.symbol,
-        "name": prediction.Company.name,
+        "name": company_registry.name(prediction.PredictionSummary.symbol),
         "date_time": prediction.PredictionSummary.date_time.isoformat(),
         "positive_count": prediction.PredictionSummary.positive_count,
         "negative_count": prediction.PredictionSummary.negative_count,
@@ -82,29 +108,142 @@ def _build_prediction_response(prediction, include_news=False):
     return response
 
 
+def encode_prediction_cursor(prediction):
+    """Opaque keyset cursor pointing just past the given PredictionSummary"""
+    raw = f"{prediction.date_time.isoformat()}|{prediction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_prediction_cursor(cursor):
+    """Decode a cursor into (date_time, id), raises ValueError if it is malformed"""
+    try:
+        date_time, prediction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(date_time), int(prediction_id)
+    except (UnicodeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+@timed('storage')
+def get_predictions(symbol=None, date_from=None, date_to=None, cursor=None, limit=None, fields=None):
+    """Get predictions newest first, optionally filtered, paginated and projected
+
+    Args:
+        symbol: Only return predictions for this symbol
+        date_from: Only return predictions made on or after this date
+        date_to: Only return predictions made on or before this date
+        cursor: Keyset cursor returned by a previous page
+        limit: Maximum number of predictions to return, None for all
+        fields: Collection of response keys to keep, None for all
+
+    Returns:
+        Tuple of (predictions, next_cursor), next_cursor is None on the last page
+    """
+    include_prices = fields is None or 'future_prices' in fields
+    query = _query_predictions_with_future_prices(include_prices=include_prices)
+
+    if symbol:
+        query = query.filter(PredictionSummary.symbol == symbol.upper())
+    if date_from:
+        query = query.filter(PredictionSummary.date_time >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(PredictionSummary.date_time < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if cursor:
+        cursor_date_time, cursor_id = decode_prediction_cursor(cursor)
+        query = query.filter(tuple_(PredictionSummary.date_time, PredictionSummary.id) < (cursor_date_time, cursor_id))
+
+    query = query.order_by(PredictionSummary.date_time.desc(), PredictionSummary.id.desc())
+    if limit is not None:
+        # Fetch one extra row to know whether there is another page
+        rows = query.limit(limit + 1).all()
+    else:
+        rows = query.all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_prediction_cursor(rows[-1].PredictionSummary)
+
+    predictions = [_build_prediction_response(p) for p in rows]
+    if fields is not None:
+        predictions = [{key: value for key, value in p.items() if key in fields or key == 'id'} for p in predictions]
+
+    return predictions, next_cursor
+
+
+@timed('storage')
 def get_all_predictions():
     """Get all predictions with future closing prices for 1, 2, 3, and 7 days ahead"""
-    predictions = db.session.query(PredictionSummary, Company).join(
-        Company, PredictionSummary.symbol == Company.symbol
-    ).order_by(PredictionSummary.date_time.desc()).all()
-    
-    return [_build_prediction_response(p) for p in predictions]
+    predictions, _ = get_predictions()
+    return predictions
 
 
 def get_all_symbols():
-    symbols = db.session.query(Company.symbol).all()
-    return [symbol[0] for symbol in symbols]
+    return company_registry.symbols()
 
 def save_prediction(symbol, date_time:str, positive_count, negative_count, neutral_count, positive_probability, 
                     negative_probability, neutral_probability, stock_value, news_articles, classifications):
-    
-    if company_exists(symbol) is False:
-        save_company(symbol)
-    
+    # Returns 'saved', 'exists' (a prediction for the symbol and day was already saved) or 'unknown' (no such company)
+    return save_predictions([dict(
+        symbol=symbol,
+        date_time=date_time,
+        positive_count=positive_count,
+        negative_count=negative_count,
+        neutral_count=neutral_count,
+        positive_probability=positive_probability,
+        negative_probability=negative_probability,
+        neutral_probability=neutral_probability,
+        stock_value=stock_value,
+        news_articles=news_articles,
+        classifications=classifications
+    )])[0]
+
+
+@timed('storage')
+def save_predictions(predictions):
+    """Save many predictions with their news articles in a single transaction
+
+    Predictions whose symbol and day are already taken (e.g. saved by a
+    concurrent job) or whose symbol isn't a known company are skipped instead
+    of failing the whole transaction.
+
+    Args:
+        predictions: List of dicts with the keyword arguments of save_prediction
+
+    Returns:
+        A status per prediction, in order: 'saved', 'exists' or 'unknown'
+    """
+    # Stored uppercase like the companies they reference
+    predictions = [{**prediction, 'symbol': prediction['symbol'].upper()} for prediction in predictions]
+    known = company_registry.ensure(prediction['symbol'] for prediction in predictions)
+
+    statuses = []
+    for prediction in predictions:
+        if prediction['symbol'] not in known:
+            print(f"Unknown symbol {prediction['symbol']}, prediction not saved")
+            statuses.append('unknown')
+            continue
+        try:
+            with db.session.begin_nested():
+                _add_prediction(**prediction)
+            statuses.append('saved')
+        except IntegrityError as e:
+            if 'uq_prediction_summaries_symbol_date' not in str(e.orig):
+                raise
+            print(f"Prediction for {prediction['symbol']} on {prediction['date_time']:%Y-%m-%d} already exists, skipped")
+            statuses.append('exists')
+
+    db.session.commit()
+    return statuses
+
+
+def _add_prediction(symbol, date_time, positive_count, negative_count, neutral_count, positive_probability,
+                    negative_probability, neutral_probability, stock_value, news_articles, classifications):
+    # Add a prediction and link its news articles without committing
     # Create a new SentimentSummary object
     prediction_summary = PredictionSummary(
         symbol=symbol,
         date_time=date_time,
+        prediction_date=date_time.date(),
         positive_count=positive_count,
         negative_count=negative_count,
         neutral_count=neutral_count,
@@ -114,99 +253,141 @@ def save_prediction(symbol, date_time:str, positive_count, negative_count, neutr
         stock_value=stock_value
     )
     
-    # Add the object to the session and commit it to the database
+    # Add the object to the session and flush to get its id
     db.session.add(prediction_summary)
-    db.session.commit()
+    db.session.flush()
+    record_prediction_outcome(prediction_summary)
 
-    # Process each news article
+    # Bulk insert news articles that haven't been classified before
+    news_rows = {}
     for article, classification in zip(news_articles, classifications):
-        # Try to find existing news article by URL
-        news = ClassifiedNews.query.filter_by(url=article['url']).first()
-        
-        if not news:
-            # Create new news article if it doesn't exist
-            news = ClassifiedNews(
-                title=article['headline'],
-                url=article['url'],
-                date_time=datetime.fromtimestamp(article['datetime']),
-                classification=classification['sentiment'],
-                confidence_score=classification['probabilities'][classification['sentiment']]
+        news_rows.setdefault(article['url'], {
+            'title': article['headline'],
+            'url': article['url'],
+            'date_time': datetime.fromtimestamp(article['datetime']),
+            'classification': classification['sentiment'],
+            'confidence_score': classification['probabilities'][classification['sentiment']],
+            'backend': classification.get('backend')
+        })
+
+    if news_rows:
+        # Existing URLs are left untouched, unless a fallback label can be replaced by the preferred backend's
+        statement = insert(ClassifiedNews).values(list(news_rows.values()))
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['url'],
+            set_={
+                'classification': statement.excluded.classification,
+                'confidence_score': statement.excluded.confidence_score,
+                'backend': statement.excluded.backend
+            },
+            where=and_(
+                ClassifiedNews.backend.isnot(None),
+                ClassifiedNews.backend != router.primary.name,
+                statement.excluded.backend == router.primary.name
             )
-            db.session.add(news)
-        
-        # Always associate the news article (whether new or existing) with the prediction
-        prediction_summary.news_articles.append(news)
-    
-    db.session.commit()
+        ))
+
+        # Associate every news article (whether new or existing) with the prediction
+        news_ids = get_classified_news_by_urls(news_rows.keys())
+        db.session.execute(
+            insert(prediction_news).values([
+                {'prediction_id': prediction_summary.id, 'news_id': news.id} for news in news_ids.values()
+            ]).on_conflict_do_nothing()
+        )
+
+
+@timed('storage')
+def get_classified_news_by_urls(urls):
+    """Fetch already classified news for many URLs with a single query, keyed by URL"""
+    urls = list(set(urls))
+    if not urls:
+        return {}
+    rows = ClassifiedNews.query.filter(ClassifiedNews.url.in_(urls)).all()
+    return {row.url: row for row in rows}
+
+
+def prediction_for_company_and_date_query(symbol, date):
+    # Equality on the stored day, answered by the (symbol, prediction_date) unique index
+    if isinstance(date, str):
+        date = datetime.strptime(date, "%Y-%m-%d").date()
+    return PredictionSummary.query.filter(
+        PredictionSummary.symbol == symbol.upper(),  # Stored uppercase
+        PredictionSummary.prediction_date == date
+    )
+
+
+def predictions_since_query(cutoff_date):
+    # Range on the raw date_time column, answered by the (date_time, id) index
+    return PredictionSummary.query.filter(
+        PredictionSummary.date_time >= datetime.combine(cutoff_date, datetime.min.time())
+    ).order_by(PredictionSummary.date_time.desc())
 
 
+@timed('storage')
 def prediction_for_company_and_date_exists(symbol, date):
     # Check if a prediction for the given symbol and date already exists Ignoring time
-    existing_prediction = (PredictionSummary.query.filter_by(symbol=symbol)
-                           .filter(db.func.date(PredictionSummary.date_time) == date).first())
-    return existing_prediction is not None
+    return db.session.query(prediction_for_company_and_date_query(symbol, date).exists()).scalar()
+
+
+@timed('storage')
+def save_closing_prices(prices):
+    """Upsert many closing prices at once
 
+    Args:
+        prices: Iterable of (symbol, date, closing_price) tuples, closing_price may be None
+    """
+    rows = {}
+    for symbol, date, closing_price in prices:
+        # Stored uppercase like the companies they reference
+        symbol = symbol.upper()
+        # Check if the date is a weekend (5 = Saturday, 6 = Sunday) or a holiday
+        is_weekend = date.weekday() >= 5
+        is_holiday = is_market_holiday(date)
+        rows[(symbol, date)] = {
+            'symbol': symbol,
+            'date_time': date,
+            'closing_price': None if (is_weekend or is_holiday) else closing_price,
+            'is_weekend': is_weekend,
+            'is_holiday': is_holiday
+        }
 
-def company_exists(symbol):
-    # Query the Company table to check if the symbol exists
-    existing_company = Company.query.filter_by(symbol=symbol).first()
-    return existing_company is not None
+        if is_weekend:
+            print(f"Marked {symbol} on {date} as weekend day")
+        elif is_holiday:
+            print(f"Marked {symbol} on {date} as holiday")
+        else:
+            print(f"Saved closing price for {symbol} on {date}: {closing_price}")
 
+    known = company_registry.ensure(symbol for symbol, _ in rows)
+    rows = {key: row for key, row in rows.items() if key[0] in known}
+    if not rows:
+        return
+
+    statement = insert(ClosingPrice).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        constraint='uq_symbol_date',
+        set_={
+            'closing_price': statement.excluded.closing_price,
+            'is_weekend': statement.excluded.is_weekend,
+            'is_holiday': statement.excluded.is_holiday
+        }
+    )
+    db.session.execute(statement)
 
-def save_company(symbol):
-    name = get_company_name_by_symbol(symbol)
-    new_company = Company(symbol=symbol.upper(), name=name)
-    db.session.add(new_company)
+    # Keep the prediction outcomes in step with the prices just written
+    apply_closing_prices([(row['symbol'], row['date_time'], row['closing_price']) for row in rows.values()])
     db.session.commit()
 
 
 def save_closing_price(symbol: str, date: datetime.date, closing_price):
     """Save a closing price to the database"""
-    if company_exists(symbol) is False:
-        name = get_company_name_by_symbol(symbol)
-        new_company = Company(symbol=symbol, name=name)
-        db.session.add(new_company)
-        db.session.commit()
-    
-    # Check if the date is a weekend
-    is_weekend = date.weekday() >= 5  # 5 = Saturday, 6 = Sunday
-    
-    # Check if the date is a holiday
-    is_holiday = check_market_holiday(date)
-    
-    # Check if closing price already exists for this symbol and date
-    existing_price = ClosingPrice.query.filter_by(symbol=symbol, date_time=date).first()
-    if existing_price:
-        # Update existing price
-        existing_price.closing_price = None if (is_weekend or is_holiday) else closing_price
-        existing_price.is_weekend = is_weekend
-        existing_price.is_holiday = is_holiday
-    else:
-        # Create new closing price entry
-        closing_price_entry = ClosingPrice(
-            symbol=symbol,
-            date_time=date,
-            closing_price=None if (is_weekend or is_holiday) else closing_price,
-            is_weekend=is_weekend,
-            is_holiday=is_holiday
-        )
-        db.session.add(closing_price_entry)
-    
-    if is_weekend:
-        print(f"Marked {symbol} on {date} as weekend day")
-    elif is_holiday:
-        print(f"Marked {symbol} on {date} as holiday")
-    else:
-        print(f"Saved closing price for {symbol} on {date}: {closing_price}")
-    
-    db.session.commit()
+    save_closing_prices([(symbol, date, closing_price)])
 
 
+@timed('storage')
 def get_prediction_with_details(prediction_id: int):
     """Get a detailed prediction including news articles and future prices"""
-    prediction = db.session.query(PredictionSummary, Company).join(
-        Company, PredictionSummary.symbol == Company.symbol
-    ).filter(PredictionSummary.id == prediction_id).first()
+    prediction = _query_predictions_with_future_prices().filter(PredictionSummary.id == prediction_id).first()
     
     if not prediction:
         return None
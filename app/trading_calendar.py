@@ -0,0 +1,126 @@
+import threading
+import time
+from datetime import datetime
+
+from flask import has_app_context
+from sqlalchemy import extract
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.news_requester import get_market_holidays
+from app.storage.db_models import MarketHoliday
+
+FETCH_RETRY_SECONDS = 300  # Delay before retrying a failed holiday fetch
+
+
+class TradingCalendar:
+    """Holiday calendar of one exchange, answered from memory.
+
+    Each year is loaded at most once per process: first from the
+    market_holidays table, and only if that has nothing for the year from
+    Finnhub, whose response is persisted for later runs. If Finnhub can't be
+    reached the persisted copy is used as is, and a year with nothing
+    persisted is fetched again after FETCH_RETRY_SECONDS instead of being
+    cached as holiday free.
+    """
+
+    def __init__(self, exchange="US"):
+        self.exchange = exchange
+        self._holidays = {}  # year -> set of full day holiday dates
+        self._lock = threading.Lock()
+        self._retry_at = 0  # Monotonic time before which a failed Finnhub fetch isn't retried
+
+    def _load_from_db(self, year):
+        """Return (full day holidays, whether anything was persisted for the year)"""
+        if not has_app_context():
+            return set(), False
+        rows = MarketHoliday.query.filter(
+            MarketHoliday.exchange == self.exchange,
+            extract('year', MarketHoliday.date) == year
+        ).all()
+        return {row.date for row in rows if row.is_full_day}, len(rows) > 0
+
+    def _fetch(self):
+        """Fetch the holiday list from Finnhub, persist it and return full day holidays by year"""
+        entries = get_market_holidays(self.exchange)
+
+        rows = {}
+        for entry in entries:
+            try:
+                date = datetime.strptime(entry['atDate'], '%Y-%m-%d').date()
+            except (KeyError, ValueError):
+                continue
+            rows[date] = {
+                'exchange': self.exchange,
+                'date': date,
+                'event_name': (entry.get('eventName') or '')[:100],
+                # Only consider it a holiday if tradingHour is empty (full day holiday)
+                'is_full_day': entry.get('tradingHour') == ''
+            }
+
+        if rows and has_app_context():
+            db.session.execute(insert(MarketHoliday).values(list(rows.values())).on_conflict_do_nothing(
+                constraint='uq_exchange_holiday_date'
+            ))
+            db.session.commit()
+
+        by_year = {}
+        for date, row in rows.items():
+            holidays = by_year.setdefault(date.year, set())
+            if row['is_full_day']:
+                holidays.add(date)
+        return by_year
+
+    def _holidays_for_year(self, year):
+        holidays = self._holidays.get(year)
+        if holidays is not None:
+            return holidays
+
+        with self._lock:
+            if year in self._holidays:
+                return self._holidays[year]
+
+            holidays, persisted = self._load_from_db(year)
+            if not persisted:
+                if time.monotonic() < self._retry_at:
+                    # Finnhub failed recently, don't wait on it again for every lookup
+                    return holidays
+                try:
+                    by_year = self._fetch()
+                    for fetched_year, fetched in by_year.items():
+                        self._holidays.setdefault(fetched_year, fetched)
+                    holidays = by_year.get(year, set())
+                except Exception as e:
+                    # Not cached, so the year is fetched again once the retry delay has passed
+                    print(f"Error fetching market holidays for {self.exchange}, retrying in {FETCH_RETRY_SECONDS}s: {e}")
+                    self._retry_at = time.monotonic() + FETCH_RETRY_SECONDS
+                    return holidays
+
+            self._holidays[year] = holidays
+            return holidays
+
+    def is_holiday(self, date):
+        """Check if the exchange is closed for a full day holiday on this date"""
+        return date in self._holidays_for_year(date.year)
+
+    def is_trading_day(self, date):
+        """Check if the exchange is open on this date (not a weekend and not a holiday)"""
+        return date.weekday() < 5 and not self.is_holiday(date)
+
+
+_calendars = {}
+
+
+def get_calendar(exchange="US"):
+    calendar = _calendars.get(exchange)
+    if calendar is None:
+        calendar = _calendars.setdefault(exchange, TradingCalendar(exchange))
+    return calendar
+
+
+def is_market_holiday(date, exchange="US"):
+    return get_calendar(exchange).is_holiday(date)
+
+
+def is_trading_day(date, exchange="US"):
+    return get_calendar(exchange).is_trading_day(date)
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
-from app.news_requester import get_closing_price_at_date
-from app.storage.storage import save_closing_price
+from app.storage.price_store import get_closing_prices
+from app.storage.storage import save_closing_prices
 
 
 def get_date_ahead(date, days_ahead) -> str:
@@ -12,11 +12,11 @@ def get_date_ahead(date, days_ahead) -> str:
 def save_future_closing_prices(symbol, base_date: datetime.date):
     """Save closing prices for multiple future dates (1, 2, 3, and 7 days ahead)"""
     future_days = [1, 2, 3, 7]
+    future_dates = [base_date + timedelta(days=days_ahead) for days_ahead in future_days]
     
-    for days_ahead in future_days:
-        future_date = get_date_ahead(base_date, days_ahead)
-        try:
-            price = get_closing_price_at_date(symbol, future_date)
-            save_closing_price(symbol, future_date, price)
-        except Exception as e:
-            print(f"Could not save closing price for {symbol} on {future_date}: {e}") 
\ No newline at end of file
+    try:
+        # One download covers all four dates
+        prices = get_closing_prices([(symbol, date) for date in future_dates if date <= datetime.now().date()])
+        save_closing_prices([(symbol, date, prices.get((symbol.upper(), date))) for date in future_dates])
+    except Exception as e:
+        print(f"Could not save closing prices for {symbol} after {base_date}: {e}")
@@ -15,6 +15,7 @@ const initialState: LastPriceUpdateState = {
 };
 
 const API_URL = process.env.REACT_APP_API_URL;
+const MAX_JOB_POLLS = 600; // Give up waiting for the price refresh after 10 minutes
 
 export const fetchLastPriceUpdate = createAsyncThunk(
   'lastPriceUpdate/fetch',
@@ -43,12 +44,28 @@ export const updateClosingPrices = createAsyncThunk(
       throw new Error('Failed to update prices');
     }
 
-    const result = await response.json();
-    if (result.status === 'success') {
+    // The refresh runs as a background job, poll it until it has finished
+    const { job_id } = await response.json();
+    let job;
+    let polls = 0;
+    do {
+      if (polls++ >= MAX_JOB_POLLS) {
+        throw new Error('Timed out waiting for the price update');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const jobResponse = await fetch(`${API_URL}/jobs/${job_id}`);
+      if (!jobResponse.ok) {
+        throw new Error('Failed to fetch update status');
+      }
+      job = await jobResponse.json();
+    } while (job.status === 'queued' || job.status === 'running');
+
+    const result = job.result;
+    if (result && result.status === 'success') {
       await dispatch(fetchLastPriceUpdate());
       return result;
     } else {
-      throw new Error(result.message || 'Failed to update prices');
+      throw new Error((result && result.message) || 'Failed to update prices');
     }
   }
 );
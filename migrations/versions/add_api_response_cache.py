@@ -0,0 +1,34 @@
+"""Add API response cache table
+
+Revision ID: add_api_response_cache
+Revises: add_jobs
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_api_response_cache'
+down_revision = 'add_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Persisted Finnhub responses so the cache stays warm across restarts
+    op.create_table(
+        'api_response_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('endpoint', sa.String(length=100), nullable=False),
+        sa.Column('body', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_api_response_cache_expires_at', 'api_response_cache', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_api_response_cache_expires_at', table_name='api_response_cache')
+    op.drop_table('api_response_cache')
@@ -0,0 +1,35 @@
+"""Add classification cache table
+
+Revision ID: add_classification_cache
+Revises: add_prediction_news_junction
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_classification_cache'
+down_revision = 'add_prediction_news_junction'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Content-addressed sentiment results shared by every classification path
+    op.create_table(
+        'classification_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=50), nullable=False),
+        sa.Column('prompt_version', sa.Integer(), nullable=False),
+        sa.Column('sentiment', sa.String(length=20), nullable=False),
+        sa.Column('probabilities', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_classification_cache_created_at', 'classification_cache', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_classification_cache_created_at', table_name='classification_cache')
+    op.drop_table('classification_cache')
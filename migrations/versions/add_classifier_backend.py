@@ -0,0 +1,24 @@
+"""Record the classifier backend of each classified news article
+
+Revision ID: add_classifier_backend
+Revises: add_prediction_outcomes
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_classifier_backend'
+down_revision = 'add_prediction_outcomes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable, the backend of articles classified before this is unknown
+    op.add_column('classified_news', sa.Column('backend', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    op.drop_column('classified_news', 'backend')
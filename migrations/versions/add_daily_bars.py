@@ -0,0 +1,44 @@
+"""Add daily bar price store tables
+
+Revision ID: add_daily_bars
+Revises: add_market_holidays
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_daily_bars'
+down_revision = 'add_market_holidays'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Local OHLCV store, keyed for range scans per symbol
+    op.create_table(
+        'daily_bars',
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('open', sa.Float(), nullable=True),
+        sa.Column('high', sa.Float(), nullable=True),
+        sa.Column('low', sa.Float(), nullable=True),
+        sa.Column('close', sa.Float(), nullable=True),
+        sa.Column('volume', sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint('symbol', 'date')
+    )
+
+    # Date range per symbol that has already been fetched
+    op.create_table(
+        'price_coverage',
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('first_date', sa.Date(), nullable=False),
+        sa.Column('last_date', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('price_coverage')
+    op.drop_table('daily_bars')
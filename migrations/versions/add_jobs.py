@@ -0,0 +1,39 @@
+"""Add background jobs table
+
+Revision ID: add_jobs
+Revises: add_daily_bars
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_jobs'
+down_revision = 'add_daily_bars'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Persisted status of background prediction and price refresh jobs
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('progress', sa.JSON(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_key', 'jobs', ['key'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_key', table_name='jobs')
+    op.drop_table('jobs')
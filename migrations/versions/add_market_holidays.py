@@ -0,0 +1,33 @@
+"""Add market holidays table
+
+Revision ID: add_market_holidays
+Revises: add_prediction_keyset_index
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_market_holidays'
+down_revision = 'add_prediction_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Persisted copy of the Finnhub holiday list so the trading calendar works offline
+    op.create_table(
+        'market_holidays',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('exchange', sa.String(length=10), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('event_name', sa.String(length=100), nullable=True),
+        sa.Column('is_full_day', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('exchange', 'date', name='uq_exchange_holiday_date')
+    )
+
+
+def downgrade():
+    op.drop_table('market_holidays')
@@ -0,0 +1,33 @@
+"""Store the prediction day and index (symbol, prediction_date)
+
+Revision ID: add_prediction_date
+Revises: add_prediction_unique_day
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_prediction_date'
+down_revision = 'add_prediction_unique_day'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('prediction_summaries', sa.Column('prediction_date', sa.Date(), nullable=True))
+    op.execute("UPDATE prediction_summaries SET prediction_date = date(date_time)")
+    op.alter_column('prediction_summaries', 'prediction_date', nullable=False)
+
+    # The stored column replaces the expression index and also serves (symbol, day) lookups
+    op.drop_index('uq_prediction_summaries_symbol_day', table_name='prediction_summaries')
+    op.create_unique_constraint('uq_prediction_summaries_symbol_date', 'prediction_summaries',
+                                ['symbol', 'prediction_date'])
+
+
+def downgrade():
+    op.drop_constraint('uq_prediction_summaries_symbol_date', 'prediction_summaries', type_='unique')
+    op.create_index('uq_prediction_summaries_symbol_day', 'prediction_summaries',
+                    ['symbol', sa.text('date(date_time)')], unique=True)
+    op.drop_column('prediction_summaries', 'prediction_date')
@@ -0,0 +1,23 @@
+"""Add keyset pagination index on prediction summaries
+
+Revision ID: add_prediction_keyset_index
+Revises: add_classification_cache
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_prediction_keyset_index'
+down_revision = 'add_classification_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Supports ORDER BY date_time DESC, id DESC with (date_time, id) < cursor
+    op.create_index('ix_prediction_summaries_date_time_id', 'prediction_summaries', ['date_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_prediction_summaries_date_time_id', table_name='prediction_summaries')
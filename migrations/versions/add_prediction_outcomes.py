@@ -0,0 +1,53 @@
+"""Add prediction outcome and accuracy tables
+
+Revision ID: add_prediction_outcomes
+Revises: add_api_response_cache
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_prediction_outcomes'
+down_revision = 'add_api_response_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per prediction returns and hit flags, maintained incrementally as prices arrive
+    op.create_table(
+        'prediction_outcomes',
+        sa.Column('prediction_id', sa.Integer(), nullable=False),
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('direction', sa.Integer(), nullable=False),
+        sa.Column('base_price', sa.Float(), nullable=True),
+        sa.Column('return_1d', sa.Float(), nullable=True),
+        sa.Column('return_2d', sa.Float(), nullable=True),
+        sa.Column('return_3d', sa.Float(), nullable=True),
+        sa.Column('return_7d', sa.Float(), nullable=True),
+        sa.Column('hit_1d', sa.Boolean(), nullable=True),
+        sa.Column('hit_2d', sa.Boolean(), nullable=True),
+        sa.Column('hit_3d', sa.Boolean(), nullable=True),
+        sa.Column('hit_7d', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['prediction_id'], ['prediction_summaries.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('prediction_id')
+    )
+    op.create_index('ix_prediction_outcomes_symbol', 'prediction_outcomes', ['symbol'])
+
+    # Running hit counters per symbol and horizon, '*' holds the global totals
+    op.create_table(
+        'accuracy_stats',
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('horizon', sa.Integer(), nullable=False),
+        sa.Column('evaluated', sa.Integer(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol', 'horizon')
+    )
+
+
+def downgrade():
+    op.drop_table('accuracy_stats')
+    op.drop_index('ix_prediction_outcomes_symbol', table_name='prediction_outcomes')
+    op.drop_table('prediction_outcomes')
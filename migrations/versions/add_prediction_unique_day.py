@@ -0,0 +1,47 @@
+"""Allow one prediction per symbol and day
+
+Revision ID: add_prediction_unique_day
+Revises: add_classifier_backend
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_prediction_unique_day'
+down_revision = 'add_classifier_backend'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the first of any duplicates saved by concurrent runs; news links and outcomes cascade
+    op.execute("""
+        DELETE FROM prediction_summaries later
+        USING prediction_summaries earlier
+        WHERE later.symbol = earlier.symbol
+          AND date(later.date_time) = date(earlier.date_time)
+          AND later.id > earlier.id
+    """)
+    # Recount the accuracy counters from the remaining outcomes, '*' holds the totals over all symbols
+    op.execute("DELETE FROM accuracy_stats")
+    op.execute("""
+        INSERT INTO accuracy_stats (symbol, horizon, evaluated, hits)
+        SELECT CASE WHEN GROUPING(o.symbol) = 1 THEN '*' ELSE o.symbol END,
+               h.horizon, count(h.hit), count(*) FILTER (WHERE h.hit)
+        FROM prediction_outcomes o
+        CROSS JOIN LATERAL (VALUES (1, o.hit_1d), (2, o.hit_2d), (3, o.hit_3d), (7, o.hit_7d)) AS h(horizon, hit)
+        GROUP BY GROUPING SETS ((o.symbol, h.horizon), (h.horizon))
+        HAVING count(h.hit) > 0
+    """)
+    op.create_index(
+        'uq_prediction_summaries_symbol_day',
+        'prediction_summaries',
+        ['symbol', sa.text('date(date_time)')],
+        unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_prediction_summaries_symbol_day', table_name='prediction_summaries')
@@ -0,0 +1,51 @@
+"""Add rolling sentiment tables
+
+Revision ID: add_rolling_sentiment
+Revises: add_prediction_date
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_rolling_sentiment'
+down_revision = 'add_prediction_date'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Articles counted in the rolling sentiment of a symbol, removed once they leave the window
+    op.create_table(
+        'sentiment_articles',
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('url', sa.String(length=1000), nullable=False),
+        sa.Column('published_at', sa.DateTime(), nullable=False),
+        sa.Column('sentiment', sa.String(length=20), nullable=False),
+        sa.Column('positive_probability', sa.Float(), nullable=False),
+        sa.Column('negative_probability', sa.Float(), nullable=False),
+        sa.Column('neutral_probability', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol', 'url')
+    )
+    op.create_index('ix_sentiment_articles_published_at', 'sentiment_articles', ['published_at'])
+
+    # Running counts and probability sums per symbol
+    op.create_table(
+        'sentiment_state',
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('positive_count', sa.Integer(), nullable=False),
+        sa.Column('negative_count', sa.Integer(), nullable=False),
+        sa.Column('neutral_count', sa.Integer(), nullable=False),
+        sa.Column('positive_probability', sa.Float(), nullable=False),
+        sa.Column('negative_probability', sa.Float(), nullable=False),
+        sa.Column('neutral_probability', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('sentiment_state')
+    op.drop_index('ix_sentiment_articles_published_at', table_name='sentiment_articles')
+    op.drop_table('sentiment_articles')
@@ -1,4 +1,5 @@
 from app import create_app
+from app.ai import load_classifier
 import os
 from dotenv import load_dotenv
 
@@ -6,6 +7,9 @@ load_dotenv()
 
 app = create_app()
 
+# Load the local classifier model before serving, if it is the preferred backend
+load_classifier()
+
 if __name__ == "__main__":
   # Get configuration from environment variables with defaults
   host = os.getenv('FLASK_HOST', 'localhost')
@@ -0,0 +1,21 @@
+import os
+from dotenv import load_dotenv
+import uvicorn
+
+from app.asgi import create_asgi_app
+
+load_dotenv()
+
+# Production launcher: SSE streams are served as coroutines, everything else by Flask
+application = create_asgi_app()
+
+if __name__ == "__main__":
+  host = os.getenv('FLASK_HOST', '0.0.0.0')
+  port = int(os.getenv('FLASK_PORT', 5000))
+  # Jobs live in process memory, so a single worker keeps deduplication and streaming consistent
+  workers = int(os.getenv('ASGI_WORKERS', 1))
+
+  print(f"Starting ASGI server on {host}:{port} (workers={workers})")
+  print(f"Environment: {os.getenv('FLASK_ENV', 'development')}")
+  uvicorn.run("serve:application", host=host, port=port, workers=workers,
+              timeout_keep_alive=75, log_level=os.getenv('LOG_LEVEL', 'info'))